@@ -0,0 +1,34 @@
+from functools import wraps
+from typing import Callable, TypeVar
+
+C = TypeVar("C", bound=type)
+T = TypeVar("T")
+
+
+def cache_per_class(func: Callable[[C], T]) -> Callable[[C], T]:
+    """
+    Memoize a function of a single class argument.
+
+    Model classes, their annotations and fieldset configs do not change after
+    class creation, so anything derived from them alone is computed once per
+    class.
+
+    Results are stored on the class itself, so they are garbage collected
+    along with it even when they reference the class (eg: a TypeAdapter or a
+    self referencing response model).  They are looked up in the class' own
+    namespace, a subclass never shares its parent's result.
+    """
+    attribute_name = f"__pydantic_enhanced_serializer_{func.__name__}__"
+
+    @wraps(func)
+    def wrapper(cls: C) -> T:
+        try:
+            return cls.__dict__[attribute_name]
+        except KeyError:
+            pass
+
+        result = func(cls)
+        setattr(cls, attribute_name, result)
+        return result
+
+    return wrapper
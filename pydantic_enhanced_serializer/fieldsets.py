@@ -1,9 +1,28 @@
 from collections import defaultdict
+from collections.abc import Collection
+from dataclasses import fields as dataclass_fields
+from dataclasses import is_dataclass
 from inspect import isclass
-from typing import Any, Dict, List, Optional, Set, Tuple, Union, get_origin
+from typing import (
+    Any,
+    Dict,
+    ForwardRef,
+    FrozenSet,
+    List,
+    Literal,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
 
 from pydantic import BaseModel
 
+from .class_cache import cache_per_class
 from .models import ExpansionBase, ExpansionInstruction
 
 
@@ -90,30 +109,8 @@ def fieldset_to_includes(
     fieldsets: Optional[dict] = getattr(model, "fieldset_config", {}).get(
         "fieldsets", None
     )
-    default_fieldset: Optional[Set] = None
-    if fieldsets and fieldsets.get("default"):
-        default_fieldset = (
-            set(fieldsets["default"])
-            if isinstance(fieldsets["default"], list)
-            else set([fieldsets["default"]])
-        )
-
-    if fieldsets is None or (default_fieldset and "*" in default_fieldset):
-        # no fieldsets set or * in default, enable ALL fields
-        fields_request.update([name for name in model.model_fields.keys()])
-
-        # and add in all expansions
-        if fieldsets:
-            fields_request.update(
-                [
-                    name
-                    for name in fieldsets.keys()
-                    if isinstance(fieldsets[name], ExpansionBase)
-                ]
-            )
-
-    elif default_fieldset:
-        fields_request.update(default_fieldset)
+    fields_request = fields_request | model_default_fields(type(model))
+    field_kinds = model_field_kinds(type(model))
 
     if path is None:
         path = []
@@ -131,14 +128,21 @@ def fieldset_to_includes(
             field = fieldset
             subfields = set([])
 
-        field_obj = model.model_fields.get(field)
+        field_kind = field_kinds.get(field)
 
-        if field_obj:
-            if (
-                (origin := get_origin(field_obj.annotation))
-                and isclass(origin)
-                and issubclass(origin, (list, set, tuple))
-            ):
+        if field_kind:
+            if current_includes_ptr.get(field) is True:
+                # already included whole
+                continue
+
+            field_value = getattr(model, field)
+            if field_value and _value_renders_whole(field_value, field_kind):
+                # Nothing inside needs filtering or expanding (eg: a list of
+                # unconfigured models), so include it whole instead of walking
+                # every item and field
+                current_includes_ptr[field] = True
+
+            elif field_kind == "list":
                 # Field value is a list of models
                 if field not in current_includes_ptr:
                     current_includes_ptr[field] = defaultdict(dict)
@@ -146,7 +150,7 @@ def fieldset_to_includes(
                 # while this could be done abstractly on the model class
                 # and using __all__, we need to examine each item for its
                 # own expansions
-                for idx, item in enumerate(getattr(model, field) or []):
+                for idx, item in enumerate(field_value or []):
                     sub_includes, sub_expansions = fieldset_to_includes(
                         subfields, item, path + [field, idx]
                     )
@@ -154,17 +158,13 @@ def fieldset_to_includes(
                     current_includes_ptr[field][idx].update(sub_includes)
                     expansions.update(sub_expansions)
 
-            elif (
-                (origin := get_origin(field_obj.annotation))
-                and isclass(origin)
-                and issubclass(origin, (dict,))
-            ):
+            elif field_kind == "dict":
                 # Field is a dict, values may or may not contain models
                 # or nested dicts/lists of models
                 if field not in current_includes_ptr:
                     current_includes_ptr[field] = defaultdict(dict)
 
-                for key, value in (getattr(model, field) or {}).items():
+                for key, value in (field_value or {}).items():
                     sub_includes, sub_expansions = fieldset_to_includes(
                         subfields, value, path + [field, key]
                     )
@@ -178,7 +178,7 @@ def fieldset_to_includes(
                     current_includes_ptr[field] = defaultdict(dict)
 
                 sub_includes, sub_expansions = fieldset_to_includes(
-                    subfields, getattr(model, field), path + [field]
+                    subfields, field_value, path + [field]
                 )
 
                 current_includes_ptr[field].update(sub_includes)
@@ -207,24 +207,10 @@ def fieldset_to_includes(
                 # requests have been seen
                 expansion_fieldsets[field].update(subfields)
 
-        elif fieldsets and (named_fieldset := fieldsets.get(field)):
+        elif fieldsets and fieldsets.get(field):
             # Fieldset collection by name
-
-            # reference to field of same name that does not exist leads to infinite recursion
-            named_fieldset = [
-                fieldset_field
-                for fieldset_field in named_fieldset
-                if (
-                    model.model_fields.get(fieldset_field)
-                    or (
-                        fieldsets
-                        and fieldsets.get(fieldset_field)
-                        and field != fieldset_field
-                    )
-                )
-            ]
             sub_includes, sub_expansions = fieldset_to_includes(
-                named_fieldset, model, path
+                model_named_fieldsets(type(model))[field], model, path
             )
             current_includes_ptr.update(sub_includes)
             expansions.update(sub_expansions)
@@ -246,3 +232,225 @@ def fieldset_to_includes(
             )
 
     return {k: v for k, v in includes.items() if v is not None}, expansions
+
+
+@cache_per_class
+def model_default_fields(model_class: Type[BaseModel]) -> FrozenSet[str]:
+    """
+    Field, fieldset and expansion names that are always added to a request
+    for an instance of `model_class`:
+
+        - With no fieldset config or `*` in the default fieldset, every field
+          and every expansion.
+        - Otherwise, the contents of the default fieldset (if any).
+    """
+    fieldsets: Optional[dict] = getattr(model_class, "fieldset_config", {}).get(
+        "fieldsets", None
+    )
+    default_fieldset: Optional[Set] = None
+    if fieldsets and fieldsets.get("default"):
+        default_fieldset = (
+            set(fieldsets["default"])
+            if isinstance(fieldsets["default"], list)
+            else set([fieldsets["default"]])
+        )
+
+    default_fields: Set[str] = set()
+    if fieldsets is None or (default_fieldset and "*" in default_fieldset):
+        # no fieldsets set or * in default, enable ALL fields
+        default_fields.update(model_class.model_fields.keys())
+
+        # and add in all expansions
+        if fieldsets:
+            default_fields.update(
+                [
+                    name
+                    for name in fieldsets.keys()
+                    if isinstance(fieldsets[name], ExpansionBase)
+                ]
+            )
+
+    elif default_fieldset:
+        default_fields.update(default_fieldset)
+
+    return frozenset(default_fields)
+
+
+@cache_per_class
+def model_named_fieldsets(model_class: Type[BaseModel]) -> Dict[str, List[str]]:
+    """
+    Map each named (non expansion) fieldset of `model_class` to its members
+    that can be resolved: model fields, or other fieldsets.  A member naming
+    its own fieldset that is not also a field is dropped, as it would
+    otherwise recurse forever.
+    """
+    fieldsets: dict = getattr(model_class, "fieldset_config", {}).get("fieldsets") or {}
+    named_fieldsets = {
+        name: [
+            fieldset_field
+            for fieldset_field in fieldset
+            if (
+                fieldset_field in model_class.model_fields
+                or (fieldsets.get(fieldset_field) and name != fieldset_field)
+            )
+        ]
+        for name, fieldset in fieldsets.items()
+        if fieldset and not isinstance(fieldset, ExpansionBase)
+    }
+
+    return named_fieldsets
+
+
+# field values of these exact types are rendered as is
+_SCALAR_TYPES = (str, int, float, bool, bytes)
+
+
+def _value_renders_whole(value: Any, field_kind: "FieldKind") -> bool:
+    """
+    True if a field value can be included whole: it (or every item of a list
+    or dict field) is a plain scalar or a model that renders all its fields.
+    """
+    if field_kind == "list":
+        items = value
+    elif field_kind == "dict":
+        items = value.values()
+    else:
+        items = (value,)
+
+    for item in items:
+        if item is None or type(item) in _SCALAR_TYPES:
+            continue
+
+        if isinstance(item, BaseModel) and model_renders_all_fields(item):
+            continue
+
+        return False
+
+    return True
+
+
+FieldKind = Literal["list", "dict", "single"]
+
+
+@cache_per_class
+def model_field_kinds(model_class: Type[BaseModel]) -> Dict[str, FieldKind]:
+    """
+    Map every field name of `model_class` to how its value is walked when
+    building includes: `list` (list, set or tuple of values), `dict` or `single`.
+    """
+    field_kinds: Dict[str, FieldKind] = {}
+    for name, field in model_class.model_fields.items():
+        origin = get_origin(field.annotation)
+        if isclass(origin) and issubclass(origin, (list, set, tuple)):
+            field_kinds[name] = "list"
+        elif isclass(origin) and issubclass(origin, dict):
+            field_kinds[name] = "dict"
+        else:
+            field_kinds[name] = "single"
+
+    return field_kinds
+
+
+def model_renders_all_fields(model: BaseModel) -> bool:
+    """
+    True if rendering `model` produces every field, whatever fields or
+    fieldsets are requested.
+
+    That is the case when neither the model nor any model (or dataclass) held
+    in its field values restricts its fields with a fieldset config or defines
+    any expansions.  Such models can be rendered with a plain `model_dump()`.
+
+    Field values are checked by their runtime type, as a field can hold an
+    instance of a subclass of its annotation (or anything at all for `Any`
+    or bare containers).
+    """
+    fields_to_check = _model_fields_to_check(type(model))
+    if fields_to_check is None:
+        return False
+
+    return all(
+        _value_renders_all_fields(getattr(model, field)) for field in fields_to_check
+    )
+
+
+def _value_renders_all_fields(value: Any) -> bool:
+    if isinstance(value, BaseModel):
+        return model_renders_all_fields(value)
+
+    if isinstance(value, (list, set, tuple, frozenset)):
+        return all(_value_renders_all_fields(item) for item in value)
+
+    if isinstance(value, dict):
+        return all(_value_renders_all_fields(item) for item in value.values())
+
+    if is_dataclass(value) and not isinstance(value, type):
+        return all(
+            _value_renders_all_fields(getattr(value, field.name))
+            for field in dataclass_fields(value)
+        )
+
+    return True
+
+
+@cache_per_class
+def _model_fields_to_check(model_class: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    None if instances of `model_class` always need filtering, otherwise the
+    names of its fields that could hold models, whose values have to be
+    checked as well.
+    """
+    # computed fields and extra fields are dropped by pydantic as soon as
+    # an `include` is given, so those models must always be filtered
+    if (
+        model_class.model_computed_fields
+        or model_class.model_config.get("extra") == "allow"
+    ):
+        return None
+
+    fieldsets: Optional[dict] = getattr(model_class, "fieldset_config", {}).get(
+        "fieldsets", None
+    )
+
+    if fieldsets is not None:
+        default_fieldset = fieldsets.get("default") or []
+        if isinstance(default_fieldset, str):
+            default_fieldset = [default_fieldset]
+
+        if "*" not in default_fieldset or any(
+            isinstance(fieldset, ExpansionBase) for fieldset in fieldsets.values()
+        ):
+            return None
+
+    return tuple(
+        name
+        for name, field in model_class.model_fields.items()
+        if _annotation_may_hold_models(field.annotation)
+    )
+
+
+def _annotation_may_hold_models(annotation: Any) -> bool:
+    if annotation is Any or isinstance(annotation, (TypeVar, ForwardRef, str)):
+        return True
+
+    if (origin := get_origin(annotation)) is not None:
+        if origin is Literal:
+            return False
+
+        args = [arg for arg in get_args(annotation) if arg is not Ellipsis]
+
+        # unparameterized generics (eg: `typing.List`) could hold anything
+        return not args or any(_annotation_may_hold_models(arg) for arg in args)
+
+    if isclass(annotation):
+        # bare containers (eg: `dict`, `list`) could hold anything
+        return (
+            issubclass(annotation, BaseModel)
+            or is_dataclass(annotation)
+            or annotation is object
+            or (
+                issubclass(annotation, Collection)
+                and not issubclass(annotation, (str, bytes, bytearray))
+            )
+        )
+
+    return False
@@ -1,7 +1,6 @@
 import asyncio
 import inspect
 from functools import wraps
-from json.decoder import JSONDecodeError
 from typing import Any, Callable, List, Optional
 
 from fastapi import APIRouter as BaseAPIRouter
@@ -9,6 +8,7 @@ from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ValidationError
+from pydantic_core import from_json
 
 from ..render import render_fieldset_model
 
@@ -117,10 +117,12 @@ class APIRouter(BaseAPIRouter):
         body_bytes = await request.body()
         if body_bytes:
             try:
-                data = await request.json()
+                # parse the body bytes we already have with pydantic-core's
+                # parser rather than going through `request.json()`
+                data = from_json(body_bytes)
                 raw_fields = data.get(self.serializer_request_fields_name)
                 from_body = True
-            except JSONDecodeError:
+            except ValueError:
                 pass
 
         if not raw_fields:
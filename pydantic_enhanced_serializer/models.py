@@ -1,8 +1,9 @@
 import abc
 from asyncio import get_event_loop, isfuture
+from dataclasses import dataclass
 from typing import Any, Awaitable, Dict, List, Optional, TypedDict, Union
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, Field
 
 
 class ExpansionBase(BaseModel, abc.ABC):
@@ -74,7 +75,16 @@ class ModelExpansion(ExpansionBase):
         return value
 
 
-class ExpansionInstruction(BaseModel):
+@dataclass(slots=True)
+class ExpansionInstruction:
+    """
+    Internal, render-time record of a single requested expansion.
+
+    These are created for every expansion of every model instance in a
+    response and are never validated or serialized, so a slotted dataclass
+    is used instead of a pydantic model.
+    """
+
     expansion_definition: ExpansionBase
     expansion_name: str
     path: List[Union[str, int]]
@@ -84,7 +94,5 @@ class ExpansionInstruction(BaseModel):
     # render time
     future: Optional[Awaitable] = None
 
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-
     def __hash__(self) -> int:
         return sum([hash(str(p)) for p in self.path] + [hash(self.expansion_name)])
@@ -1,10 +1,12 @@
-from asyncio import gather
+from asyncio import gather, sleep
 from copy import copy
-from typing import Any, List, Set, Union
+from dataclasses import is_dataclass
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple, Type, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PydanticSchemaGenerationError, TypeAdapter
 
-from .fieldsets import fieldset_to_includes
+from .class_cache import cache_per_class
+from .fieldsets import fieldset_to_includes, model_renders_all_fields
 from .models import ExpansionInstruction
 from .path_put import path_put
 
@@ -19,6 +21,14 @@ async def render_fieldset_model(
     exclude_defaults: bool = False,
     exclude_none: bool = False,
 ) -> dict:
+    if model_renders_all_fields(model):
+        # nothing to filter or expand, let pydantic render everything
+        return model.model_dump(
+            exclude_unset=exclude_unset,
+            exclude_defaults=exclude_defaults,
+            exclude_none=exclude_none,
+        )
+
     includes, expansions = fieldset_to_includes(fieldsets, model)
     rendered_model = model.model_dump(
         include=includes,
@@ -54,12 +64,23 @@ async def render_expansions(
 ) -> Set[ExpansionInstruction]:
     new_expansions = set()
 
+    # The same expansion requested more than once on the same model instance
+    # (eg: one object appearing several times in a list) is only run once, the
+    # instructions share its future.
+    futures: Dict[Tuple[int, int], Awaitable] = {}
     for expansion in expansions:
-        expansion.future = expansion.expansion_definition.expand(  # type: ignore
-            source_model=expansion.source_model, context=expansion_context
-        )
+        key = (id(expansion.source_model), id(expansion.expansion_definition))
+        if key not in futures:
+            futures[key] = expansion.expansion_definition.expand(
+                source_model=expansion.source_model, context=expansion_context
+            )
+        expansion.future = futures[key]
 
-    await gather(*[e.future for e in expansions if e.future])
+    # Yield to the event loop once before waiting so that every data loader
+    # used at this level gets to dispatch its batch in the same loop iteration.
+    await sleep(0)
+
+    await gather(*[future for future in futures.values() if future])
 
     for expansion in expansions:
         expanded_value = None
@@ -100,7 +121,9 @@ async def render_expansions(
             expansion.expansion_definition.merge_fields_upwards
             and len(expansion.path) > 0
         ):
-            path_put(rendered_content, copy(expansion.path)[:-1], rendered_value)
+            # path_put consumes the path it is given, slicing already copies it.
+            # The rendered fields are merged straight into the parent's dict.
+            path_put(rendered_content, expansion.path[:-1], rendered_value)
         else:
             path_put(rendered_content, copy(expansion.path), rendered_value)
 
@@ -132,10 +155,30 @@ def nested_structure_model_dump(
             exclude_none=exclude_none,
         )
 
+    if is_dataclass(value) and not isinstance(value, type):
+        # Dataclasses carry no fieldsets, they are always rendered whole
+        adapter = _dataclass_adapter(type(value))
+        if adapter is None:
+            return value
+
+        return adapter.dump_python(
+            value,
+            by_alias=False,
+            exclude_unset=exclude_unset,
+            exclude_defaults=exclude_defaults,
+            exclude_none=exclude_none,
+        )
+
     if isinstance(value, (list, set, tuple)):
+        # Items are independent of each other.  Plain values (ids, strings...) are
+        # passed through as is, only models and containers need to be walked.
         return [
-            nested_structure_model_dump(
-                v, includes[idx], exclude_unset, exclude_defaults, exclude_none
+            (
+                nested_structure_model_dump(
+                    v, includes[idx], exclude_unset, exclude_defaults, exclude_none
+                )
+                if isinstance(v, (BaseModel, list, set, tuple, dict)) or is_dataclass(v)
+                else v
             )
             for idx, v in enumerate(value)
         ]
@@ -153,3 +196,16 @@ def nested_structure_model_dump(
         }
 
     return value
+
+
+@cache_per_class
+def _dataclass_adapter(dataclass_type: Type) -> Optional[TypeAdapter]:
+    """
+    TypeAdapter used to dump instances of `dataclass_type`, or None when
+    pydantic can not build a schema for it (eg: a field typed with an
+    arbitrary class), in which case instances are passed through as is.
+    """
+    try:
+        return TypeAdapter(dataclass_type)
+    except PydanticSchemaGenerationError:
+        return None
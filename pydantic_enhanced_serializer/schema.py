@@ -1,5 +1,19 @@
+from collections import defaultdict
+from collections.abc import Awaitable
 from inspect import isclass
-from typing import Any, Dict, List, Optional, Set, Type, Union, get_args, get_origin
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 import pydantic
 from packaging.version import Version
@@ -10,7 +24,8 @@ from pydantic._internal._generate_schema import GenerateSchema
 from pydantic.json_schema import GenerateJsonSchema, JsonSchemaValue
 from pydantic_core.core_schema import CoreSchema, ModelSchema
 
-from .models import ExpansionBase
+from .class_cache import cache_per_class
+from .models import ExpansionBase, ModelExpansion
 
 pydantic_version = parse_version(pydantic.__version__)
 namespace_refactored_pydantic_version = Version("2.10")
@@ -26,39 +41,19 @@ class FieldsetGenerateJsonSchema(GenerateJsonSchema):
         if not hasattr(model, "fieldset_config"):
             return json_schema
 
-        fieldsets = model.fieldset_config.get("fieldsets")
-
         # for regular fields, set a description based on their fieldset configuration
-        for field_name in model.model_fields.keys():
-            field_schema = json_schema["properties"][field_name]
-            fieldset_names = [
-                fieldset_name
-                for fieldset_name in fieldsets.keys()
-                if isinstance(fieldsets[fieldset_name], list)
-                and (
-                    field_name in fieldsets[fieldset_name]
-                    or "*" in fieldsets[fieldset_name]
-                )
-            ]
-
-            if not fieldset_names:
-                # nothing is returned by default, must always ask for this field explicity
-                field_schema["description"] = _concat_description(
-                    field_schema.get("description"),
-                    "Not returned by default.  Request this field by name.",
-                )
-
-            elif "default" not in fieldset_names and len(fieldset_names) > 0:
-                field_schema["description"] = _concat_description(
-                    field_schema.get("description"),
-                    "Request by name or using fieldset(s): "
-                    + ", ".join(
-                        [f"`{f}`" for f in sorted(fieldset_names) if f != "default"]
-                    )
-                    + ".",
-                )
+        properties = json_schema["properties"]
+        for field_name, description in _model_field_descriptions(model).items():
+            field_schema = properties[field_name]
+            field_schema["description"] = _concat_description(
+                field_schema.get("description"), description
+            )
 
         # detail expansions
+        response_models = _model_expansion_response_models(model)
+        if not response_models:
+            return json_schema
+
         if pydantic_version < namespace_refactored_pydantic_version:
             generator = GenerateSchema(
                 config_wrapper=ConfigWrapper(config={}), types_namespace=None  # type: ignore
@@ -66,14 +61,8 @@ class FieldsetGenerateJsonSchema(GenerateJsonSchema):
         else:
             generator = GenerateSchema(config_wrapper=ConfigWrapper(config={}))  # type: ignore
 
-        for expansion_name, expansion in fieldsets.items():
-            if not isinstance(expansion, ExpansionBase):
-                continue
-
-            if expansion.response_model is None:
-                continue
-
-            target_type = _get_target_type(expansion.response_model)
+        for expansion_name, response_model in response_models.items():
+            target_type = _get_target_type(response_model)
 
             # If this is a not before seen model class, it needs to be registered
             # before we can $ref it
@@ -84,17 +73,14 @@ class FieldsetGenerateJsonSchema(GenerateJsonSchema):
             if isclass(target_type) and issubclass(target_type, BaseModel):
                 model_schema = generator._model_schema(target_type)
                 defs_ref = self.get_defs_ref((model_schema["schema_ref"], self.mode))
-                sub_json_schema = {"$ref": self.ref_template.format(model=defs_ref)}
+                sub_json_schema = _wrap_target_json_schema(
+                    response_model,
+                    {"$ref": self.ref_template.format(model=defs_ref)},
+                )
                 model_name = target_type.__pydantic_core_schema__.get("config", {}).get(
                     "title"
                 )
 
-                if _is_list(expansion.response_model):
-                    sub_json_schema = {"type": "array", "items": sub_json_schema}
-
-                elif _is_optional(expansion.response_model):
-                    sub_json_schema = {"anyOf": [sub_json_schema, {"type": "null"}]}
-
                 if defs_ref not in self.definitions:
                     # guard against recursion on the same object
                     self.definitions[defs_ref] = {}
@@ -103,10 +89,10 @@ class FieldsetGenerateJsonSchema(GenerateJsonSchema):
                     )
 
             else:
-                core_schema = generator.match_type(expansion.response_model)
+                core_schema = generator.match_type(response_model)
                 sub_json_schema = self.generate_inner(core_schema)
 
-            json_schema["properties"][expansion_name] = {
+            properties[expansion_name] = {
                 "title": (model_name or expansion_name).replace("_", " "),
                 "description": f"Request by name or using fieldset(s): `{expansion_name}`.",
                 **sub_json_schema,
@@ -115,6 +101,128 @@ class FieldsetGenerateJsonSchema(GenerateJsonSchema):
         return json_schema
 
 
+@cache_per_class
+def _model_field_descriptions(model: Type[BaseModel]) -> Dict[str, str]:
+    """
+    Map each field of `model` that is not returned by default to the text
+    describing how to request it.
+    """
+    fieldsets: dict = getattr(model, "fieldset_config", {}).get("fieldsets") or {}
+
+    # invert the fieldsets once, field name -> names of fieldsets listing it,
+    # rather than scanning every fieldset's list for every field
+    star_fieldset_names: Set[str] = set()
+    fieldset_names_by_field: Dict[str, Set[str]] = defaultdict(set)
+    for fieldset_name, fieldset in fieldsets.items():
+        if not isinstance(fieldset, list):
+            continue
+
+        for fieldset_field in fieldset:
+            if fieldset_field == "*":
+                star_fieldset_names.add(fieldset_name)
+            else:
+                fieldset_names_by_field[fieldset_field].add(fieldset_name)
+
+    descriptions: Dict[str, str] = {}
+    for field_name in model.model_fields.keys():
+        fieldset_names = (
+            fieldset_names_by_field.get(field_name, set()) | star_fieldset_names
+        )
+
+        if not fieldset_names:
+            # nothing is returned by default, must always ask for this field explicity
+            descriptions[field_name] = (
+                "Not returned by default.  Request this field by name."
+            )
+
+        elif "default" not in fieldset_names:
+            descriptions[field_name] = (
+                "Request by name or using fieldset(s): "
+                + ", ".join([f"`{f}`" for f in sorted(fieldset_names)])
+                + "."
+            )
+
+    return descriptions
+
+
+def _model_expansion_response_models(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Map each expansion of `model` that has a known response model to that
+    response model, which may be inferred from the expansion method's type hints.
+    """
+    response_models: Dict[str, Any] = {}
+    for expansion_name, expansion, response_model in _model_expansion_candidates(model):
+        if response_model is _UNRESOLVED:
+            # The method's hints named something not defined at the time, it
+            # may well be by now.
+            response_model = _resolve_response_model(model, expansion)
+
+        if response_model is not None and response_model is not _UNRESOLVED:
+            response_models[expansion_name] = response_model
+
+    return response_models
+
+
+# Marks a response model whose inference hit a not (yet) defined forward reference
+_UNRESOLVED = object()
+
+
+@cache_per_class
+def _model_expansion_candidates(
+    model: Type[BaseModel],
+) -> Tuple[Tuple[str, ExpansionBase, Any], ...]:
+    """
+    Each expansion of `model` with its response model, if any, or _UNRESOLVED
+    when inference must be retried later.
+    """
+    fieldsets: dict = getattr(model, "fieldset_config", {}).get("fieldsets") or {}
+    return tuple(
+        (expansion_name, expansion, _resolve_response_model(model, expansion))
+        for expansion_name, expansion in fieldsets.items()
+        if isinstance(expansion, ExpansionBase)
+    )
+
+
+def _resolve_response_model(model: Type[BaseModel], expansion: ExpansionBase) -> Any:
+    try:
+        return _get_response_model(model, expansion)
+    except NameError:
+        return _UNRESOLVED
+
+
+def _get_response_model(model: Type[BaseModel], expansion: ExpansionBase) -> Any:
+    """
+    The expansion's response_model, or when that is not set, the return
+    annotation of a ModelExpansion's method if it names a pydantic model
+    (optionally wrapped in an Optional, list, dict or Awaitable).
+
+    Raises NameError when the method's hints name something not yet defined.
+    """
+    if expansion.response_model is not None or not isinstance(
+        expansion, ModelExpansion
+    ):
+        return expansion.response_model
+
+    method = getattr(model, expansion.expansion_method_name, None)
+    if not callable(method):
+        return None
+
+    try:
+        annotation = get_type_hints(method).get("return")
+    except TypeError:
+        return None
+
+    origin = get_origin(annotation)
+    if isclass(origin) and issubclass(origin, Awaitable):
+        annotation = get_args(annotation)[-1] if get_args(annotation) else None
+
+    target_type = _get_target_type(annotation)
+    if isclass(target_type) and issubclass(target_type, BaseModel):
+        return annotation
+
+    return None
+
+
 def _concat_description(description: Optional[str], additional: str) -> str:
     if description is None:
         return additional
@@ -146,6 +254,38 @@ def _get_target_type(value: Any) -> Any:
     return value
 
 
+def _wrap_target_json_schema(value: Any, target_json_schema: dict) -> dict:
+    """Wrap the target type's json schema in the list/dict/optional layers around it"""
+    if _is_optional(value):
+        return {
+            "anyOf": [
+                _wrap_target_json_schema(_get_optional_type(value), target_json_schema),
+                {"type": "null"},
+            ]
+        }
+
+    if _is_list(value) and (list_args := get_args(value)):
+        return {
+            "type": "array",
+            "items": _wrap_target_json_schema(list_args[0], target_json_schema),
+        }
+
+    if (
+        isclass(get_origin(value))
+        and issubclass(get_origin(value), (dict, Dict))
+        and (dict_args := get_args(value))
+        and len(dict_args) == 2
+    ):
+        return {
+            "type": "object",
+            "additionalProperties": _wrap_target_json_schema(
+                dict_args[1], target_json_schema
+            ),
+        }
+
+    return target_json_schema
+
+
 def _is_optional(type_: Any) -> bool:
     return (
         get_origin(type_) is Union
@@ -174,16 +314,37 @@ def model_has_fieldsets_defined(model: Any) -> bool:
     if _is_optional(model):
         model = _get_optional_type(model)
 
-    if isclass(model) and issubclass(model, BaseModel):
-        if getattr(model, "fieldset_config", None):
-            return True
+    if not (isclass(model) and issubclass(model, BaseModel)):
+        return False
 
-        else:
-            return any(
-                [
-                    model_has_fieldsets_defined(field.annotation)
-                    for field in model.model_fields.values()
-                ]
-            )
+    return _model_class_has_fieldsets_defined(model)
+
+
+@cache_per_class
+def _model_class_has_fieldsets_defined(model: Type[BaseModel]) -> bool:
+    return _model_has_fieldsets_defined(model, set())
+
+
+def _model_has_fieldsets_defined(
+    model: Type[BaseModel], seen: Set[Type[BaseModel]]
+) -> bool:
+    if getattr(model, "fieldset_config", None):
+        return True
+
+    # guard against recursion on self referencing models
+    seen.add(model)
+
+    for field in model.model_fields.values():
+        annotation = field.annotation
+        if _is_optional(annotation):
+            annotation = _get_optional_type(annotation)
+
+        if (
+            isclass(annotation)
+            and issubclass(annotation, BaseModel)
+            and annotation not in seen
+            and _model_has_fieldsets_defined(annotation, seen)
+        ):
+            return True
 
     return False
@@ -1,3 +1,19 @@
+import asyncio
+from typing import Iterator
+
 import pytest
 
 pytest.register_assert_rewrite("tests.utils")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def shared_event_loop() -> Iterator[asyncio.AbstractEventLoop]:
+    """
+    One event loop for the whole session, set as the current loop so that
+    dataloaders created in test bodies bind to the loop rendering runs on.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
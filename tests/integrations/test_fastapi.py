@@ -56,6 +56,23 @@ def test_get_fields_from_request(
     assert sorted(response.json()["fieldsets"]) == sorted(expected)
 
 
+def test_get_fields_from_request_invalid_json_body() -> None:
+    api = APIRouter()
+
+    @api.post("/")
+    async def get_fields(request: Request) -> dict:
+        return {"fieldsets": await api._get_fields_from_request(request)}
+
+    app = FastAPI()
+    app.include_router(api)
+
+    client = TestClient(app)
+    response = client.post("/?fields=field1,field2", content=b"{not json")
+
+    assert response.status_code == 200
+    assert sorted(response.json()["fieldsets"]) == ["field1", "field2"]
+
+
 def test_field_filtered_response() -> None:
     class SubModel(BaseModel):
         sfield1: str
@@ -1,37 +1,43 @@
 import datetime
-from typing import Any, Awaitable, ClassVar, Dict, List, Optional
+import gc
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, ClassVar, Dict, Iterator, List, Optional
 
 import pytest
 from aiodataloader import DataLoader  # type: ignore
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, Field
 
 from pydantic_enhanced_serializer import FieldsetConfig, ModelExpansion
 
 from .utils import assert_expected_rendered_fieldset_data
 
 
-def test_singleton_expansion() -> None:
-    class ExpandedModel(BaseModel):
-        thing: str
-        thing2: str
+class SingletonExpandedModel(BaseModel):
+    thing: str
+    thing2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
 
-        def get_zoom(self, context: Any) -> ExpandedModel:
-            return ExpandedModel(thing="what!", thing2="red")
+class SingletonResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(expansion_method_name="get_zoom"),
-            }
-        )
+    def get_zoom(self, context: Any) -> SingletonExpandedModel:
+        return SingletonExpandedModel(thing="what!", thing2="red")
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "zoom": ModelExpansion(expansion_method_name="get_zoom"),
+        }
+    )
 
-    api_response = ResponseModel(
+
+def test_singleton_expansion() -> None:
+    api_response = SingletonResponseModel(
         field1="one",
         field2="two",
         field3="three",
@@ -44,42 +50,140 @@ def test_singleton_expansion() -> None:
     )
 
 
-def test_nested_singleton_expansion() -> None:
-    class SubExpandedModel(BaseModel):
-        field1: str
+@dataclass
+class DataclassExpanded:
+    field1: str
+    field2: int
 
-    class ExpandedModel(BaseModel):
-        thing: str
-        thing2: str
 
-        def get_sub(self, context: Any) -> SubExpandedModel:
-            return SubExpandedModel(field1="foo")
+class DataclassOpaque:
+    pass
+
+
+@dataclass
+class DataclassWithOpaqueField:
+    opaque: DataclassOpaque
+
+
+_OPAQUE_EXPANDED = DataclassWithOpaqueField(opaque=DataclassOpaque())
+
+
+class DataclassResponseModel(BaseModel):
+    field1: str
+
+    def get_single(self, context: Any) -> DataclassExpanded:
+        return DataclassExpanded(field1="foo", field2=1)
+
+    def get_many(self, context: Any) -> List[DataclassExpanded]:
+        return [
+            DataclassExpanded(field1="foo", field2=1),
+            DataclassExpanded(field1="bar", field2=2),
+        ]
+
+    def get_opaque(self, context: Any) -> DataclassWithOpaqueField:
+        return _OPAQUE_EXPANDED
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+            "single": ModelExpansion(expansion_method_name="get_single"),
+            "many": ModelExpansion(expansion_method_name="get_many"),
+            "opaque": ModelExpansion(expansion_method_name="get_opaque"),
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "sub": ModelExpansion(
-                    response_model=SubExpandedModel, expansion_method_name="get_sub"
-                )
-            },
-        )
 
-    class ResponseModel(BaseModel):
+def test_dataclass_expansion() -> None:
+    assert_expected_rendered_fieldset_data(
+        DataclassResponseModel(field1="one"),
+        ["single", "many", "opaque"],
+        {
+            "field1": "one",
+            "single": {"field1": "foo", "field2": 1},
+            "many": [
+                {"field1": "foo", "field2": 1},
+                {"field1": "bar", "field2": 2},
+            ],
+            # pydantic can not build a schema for it, so it is passed through
+            "opaque": _OPAQUE_EXPANDED,
+        },
+    )
+
+
+class DataclassFromContextResponseModel(BaseModel):
+    field1: str
+
+    def get_from_context(self, context: Any) -> Any:
+        return context["value"]
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+            "from_context": ModelExpansion(expansion_method_name="get_from_context"),
+        }
+    )
+
+
+def test_dataclass_expansion_class_released() -> None:
+    @dataclass
+    class Temporary:
         field1: str
-        field2: str
-        field3: str
 
-        def get_zoom(self, context: Any) -> ExpandedModel:
-            return ExpandedModel(thing="what!", thing2="red")
+    assert_expected_rendered_fieldset_data(
+        DataclassFromContextResponseModel(field1="one"),
+        ["from_context"],
+        {"field1": "one", "from_context": {"field1": "foo"}},
+        {"value": Temporary(field1="foo")},
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(
-                    response_model=ExpandedModel, expansion_method_name="get_zoom"
-                ),
-            }
-        )
+    # the cached adapter references the class, it must not keep it alive
+    temporary_ref = weakref.ref(Temporary)
+    del Temporary
+    gc.collect()
+
+    assert temporary_ref() is None
+
+
+class NestedSingletonSubExpandedModel(BaseModel):
+    field1: str
+
+
+class NestedSingletonExpandedModel(BaseModel):
+    thing: str
+    thing2: str
+
+    def get_sub(self, context: Any) -> NestedSingletonSubExpandedModel:
+        return NestedSingletonSubExpandedModel(field1="foo")
 
-    api_response = ResponseModel(
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "sub": ModelExpansion(
+                response_model=NestedSingletonSubExpandedModel,
+                expansion_method_name="get_sub",
+            )
+        },
+    )
+
+
+class NestedSingletonResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+
+    def get_zoom(self, context: Any) -> NestedSingletonExpandedModel:
+        return NestedSingletonExpandedModel(thing="what!", thing2="red")
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "zoom": ModelExpansion(
+                expansion_method_name="get_zoom",
+            ),
+        }
+    )
+
+
+def test_nested_singleton_expansion() -> None:
+    api_response = NestedSingletonResponseModel(
         field1="one",
         field2="two",
         field3="three",
@@ -90,49 +194,138 @@ def test_nested_singleton_expansion() -> None:
     )
 
 
-def test_dataloader_expansion() -> None:
-    loader_call_count = 0
+class DataloaderExpandedModel(BaseModel):
+    expanded_model_id: int
+    field1: str
 
-    class ExpandedModel(BaseModel):
-        expanded_model_id: int
-        field1: str
 
-    async def batch_load_expanded_models(keys: List[int]):
-        nonlocal loader_call_count
-        loader_call_count += 1
-        return list([ExpandedModel(expanded_model_id=k, field1=str(k)) for k in keys])
+class DataloaderExpandedModel2(BaseModel):
+    expanded_model2_id: int
+    field2: str
 
-    class ItemDetail(BaseModel):
-        item_id: int
-        expanded_model_id: int
-        fieldA: str
 
-        def expand(self, context: dict) -> Awaitable:
-            return context["dataloader"].load(self.item_id + 20)
+class DataloaderNestedExpandedModel(BaseModel):
+    expanded_model_id: int
+    expanded_model2_id: int
+    field1: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["item_id", "expanded_model_id", "fieldA"],
-                "expanded_model": ModelExpansion(
-                    expansion_method_name="expand",
-                ),
-            }
-        )
+    def expand_model2(self, context: dict) -> Awaitable:
+        return context["dataloader2"].load(self.expanded_model2_id)
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["expanded_model_id", "expanded_model2_id", "field1"],
+            "expanded_model2": ModelExpansion(
+                expansion_method_name="expand_model2",
+            ),
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        items: List[ItemDetail]
 
-    api_response = ResponseModel(
-        items=[
-            ItemDetail(
-                item_id=i,
-                expanded_model_id=i + 20,
-                fieldA=f"val{i}",
-            )
-            for i in range(5)
-        ]
+class DataloaderItemDetail(BaseModel):
+    item_id: int
+    expanded_model_id: int
+    expanded_model2_id: int
+    fieldA: str
+
+    def expand_model(self, context: Any) -> Awaitable:
+        return context["dataloader1"].load(self.expanded_model_id)
+
+    def expand_model2(self, context: Any) -> Awaitable:
+        return context["dataloader2"].load(self.expanded_model2_id)
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["item_id", "expanded_model_id", "fieldA"],
+            "expanded_model": ModelExpansion(
+                expansion_method_name="expand_model",
+            ),
+            "expanded_model2": ModelExpansion(
+                expansion_method_name="expand_model2",
+            ),
+        }
     )
-    context = {"dataloader": DataLoader(batch_load_fn=batch_load_expanded_models)}
+
+
+class DataloaderResponseModel(BaseModel):
+    items: List[DataloaderItemDetail]
+
+
+# Batch load functions count their calls in _CALL_COUNTS, which is reset
+# before every test.  Every key is loaded once per test, so data loaders are
+# created per test without a cache: only their batching is under test.
+_CALL_COUNTS: Counter = Counter()
+
+
+@pytest.fixture(autouse=True)
+def _reset_call_counts() -> Iterator[None]:
+    _CALL_COUNTS.clear()
+    yield
+
+
+async def batch_load_expanded_models(keys: List[int]) -> List[DataloaderExpandedModel]:
+    _CALL_COUNTS["expanded_models"] += 1
+
+    return [DataloaderExpandedModel(expanded_model_id=k, field1=str(k)) for k in keys]
+
+
+async def batch_load_expanded_models2(
+    keys: List[int],
+) -> List[DataloaderExpandedModel2]:
+    _CALL_COUNTS["expanded_models2"] += 1
+
+    return [DataloaderExpandedModel2(expanded_model2_id=k, field2=str(k)) for k in keys]
+
+
+async def batch_load_nested_expanded_models(
+    keys: List[int],
+) -> List[DataloaderNestedExpandedModel]:
+    _CALL_COUNTS["nested_expanded_models"] += 1
+
+    return [
+        DataloaderNestedExpandedModel(
+            expanded_model_id=k, expanded_model2_id=k + 20, field1=str(k)
+        )
+        for k in keys
+    ]
+
+
+@pytest.fixture(scope="module")
+def item_details() -> List[DataloaderItemDetail]:
+    return [
+        DataloaderItemDetail.model_construct(
+            item_id=i,
+            expanded_model_id=i + 20,
+            expanded_model2_id=i + 40,
+            fieldA=f"val{i}",
+        )
+        for i in range(5)
+    ]
+
+
+@pytest.fixture(scope="module")
+def expected_items() -> List[dict]:
+    return [
+        {
+            "item_id": i,
+            "expanded_model_id": i + 20,
+            "fieldA": f"val{i}",
+        }
+        for i in range(5)
+    ]
+
+
+def test_dataloader_expansion(
+    item_details: List[DataloaderItemDetail], expected_items: List[dict]
+) -> None:
+    api_response = DataloaderResponseModel(items=item_details)
+    context = {
+        "dataloader1": DataLoader(
+            batch_load_fn=batch_load_expanded_models,
+            cache=False,
+            max_batch_size=64,
+        )
+    }
 
     assert_expected_rendered_fieldset_data(
         api_response,
@@ -140,15 +333,13 @@ def test_dataloader_expansion() -> None:
         {
             "items": [
                 {
-                    "item_id": i,
-                    "expanded_model_id": i + 20,
-                    "fieldA": f"val{i}",
+                    **item,
                     "expanded_model": {
                         "expanded_model_id": i + 20,
                         "field1": str(i + 20),
                     },
                 }
-                for i in range(5)
+                for i, item in enumerate(expected_items)
             ]
         },
         context,
@@ -156,75 +347,24 @@ def test_dataloader_expansion() -> None:
 
     # Super important, make sure we are coalescing all the data loader calls, since
     # it is easy to break batching
-    assert loader_call_count == 1
-
-
-def test_multi_dataloader_expansion() -> None:
-    loader1_call_count = 0
-    loader2_call_count = 0
-
-    class ExpandedModel(BaseModel):
-        expanded_model_id: int
-        field1: str
-
-    class ExpandedModel2(BaseModel):
-        expanded_model2_id: int
-        field2: str
-
-    async def batch_load_expanded_models(keys: List[int]) -> Any:
-        nonlocal loader1_call_count
-        loader1_call_count += 1
-
-        return list([ExpandedModel(expanded_model_id=k, field1=str(k)) for k in keys])
-
-    async def batch_load_expanded_models2(keys: List[int]) -> Any:
-        nonlocal loader2_call_count
-        loader2_call_count += 1
-
-        return list([ExpandedModel2(expanded_model2_id=k, field2=str(k)) for k in keys])
+    assert _CALL_COUNTS["expanded_models"] == 1
 
-    class ItemDetail(BaseModel):
-        item_id: int
-        expanded_model_id: int
-        expanded_model2_id: int
-        fieldA: str
-
-        def expand_model(self, context: Any) -> Awaitable:
-            return context["dataloader1"].load(self.item_id + 20)
-
-        def expand_model2(self, context: Any) -> Awaitable:
-            return context["dataloader2"].load(self.item_id + 40)
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["item_id", "expanded_model_id", "fieldA"],
-                "expanded_model": ModelExpansion(
-                    expansion_method_name="expand_model",
-                ),
-                "expanded_model2": ModelExpansion(
-                    expansion_method_name="expand_model2",
-                ),
-            }
-        )
-
-    class ResponseModel(BaseModel):
-        items: List[ItemDetail]
-
-    api_response = ResponseModel(
-        items=[
-            ItemDetail(
-                item_id=i,
-                expanded_model_id=i + 20,
-                expanded_model2_id=i + 40,
-                fieldA=f"val{i}",
-            )
-            for i in range(5)
-        ]
-    )
 
+def test_multi_dataloader_expansion(
+    item_details: List[DataloaderItemDetail], expected_items: List[dict]
+) -> None:
+    api_response = DataloaderResponseModel(items=item_details)
     context = {
-        "dataloader1": DataLoader(batch_load_fn=batch_load_expanded_models),
-        "dataloader2": DataLoader(batch_load_fn=batch_load_expanded_models2),
+        "dataloader1": DataLoader(
+            batch_load_fn=batch_load_expanded_models,
+            cache=False,
+            max_batch_size=64,
+        ),
+        "dataloader2": DataLoader(
+            batch_load_fn=batch_load_expanded_models2,
+            cache=False,
+            max_batch_size=64,
+        ),
     }
 
     assert_expected_rendered_fieldset_data(
@@ -233,9 +373,7 @@ def test_multi_dataloader_expansion() -> None:
         {
             "items": [
                 {
-                    "item_id": i,
-                    "expanded_model_id": i + 20,
-                    "fieldA": f"val{i}",
+                    **item,
                     "expanded_model": {
                         "expanded_model_id": i + 20,
                         "field1": str(i + 20),
@@ -245,7 +383,7 @@ def test_multi_dataloader_expansion() -> None:
                         "field2": str(i + 40),
                     },
                 }
-                for i in range(5)
+                for i, item in enumerate(expected_items)
             ]
         },
         context,
@@ -253,88 +391,25 @@ def test_multi_dataloader_expansion() -> None:
 
     # Super important, make sure we are coalescing all the data loader calls, since
     # it is easy to break batching
-    assert loader1_call_count == 1
-    assert loader2_call_count == 1
-
-
-def test_dataloader_expansion_nested() -> None:
-    loader1_call_count = 0
-    loader2_call_count = 0
-
-    class ExpandedModel2(BaseModel):
-        expanded_model2_id: int
-        field2: str
-
-    async def batch_load_expanded_models2(keys: List[int]) -> List[ExpandedModel2]:
-        nonlocal loader2_call_count
-        loader2_call_count += 1
-
-        return list([ExpandedModel2(expanded_model2_id=k, field2=str(k)) for k in keys])
-
-    class ExpandedModel(BaseModel):
-        expanded_model_id: int
-        expanded_model2_id: int
-        field1: str
-
-        def expand_model2(self, context: dict) -> Awaitable:
-            return context["dataloader2"].load(self.expanded_model2_id)
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["expanded_model_id", "expanded_model2_id", "field1"],
-                "expanded_model2": ModelExpansion(
-                    expansion_method_name="expand_model2",
-                ),
-            }
-        )
-
-    async def batch_load_expanded_models(keys: List[int]) -> List[ExpandedModel]:
-        nonlocal loader1_call_count
-        loader1_call_count += 1
-
-        return list(
-            [
-                ExpandedModel(
-                    expanded_model_id=k, expanded_model2_id=k + 20, field1=str(k)
-                )
-                for k in keys
-            ]
-        )
-
-    class ItemDetail(BaseModel):
-        item_id: int
-        expanded_model_id: int
-        fieldA: str
-
-        def expand_model(self, context: dict) -> Awaitable:
-            return context["dataloader1"].load(self.expanded_model_id)
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["item_id", "expanded_model_id", "fieldA"],
-                "expanded_model": ModelExpansion(
-                    expansion_method_name="expand_model",
-                ),
-            }
-        )
+    assert _CALL_COUNTS["expanded_models"] == 1
+    assert _CALL_COUNTS["expanded_models2"] == 1
 
-    class ResponseModel(BaseModel):
-        items: List[ItemDetail]
-
-    api_response = ResponseModel(
-        items=[
-            ItemDetail(
-                item_id=i,
-                expanded_model_id=i + 20,
-                fieldA=f"val{i}",
-            )
-            for i in range(5)
-        ]
-    )
 
+def test_dataloader_expansion_nested(
+    item_details: List[DataloaderItemDetail], expected_items: List[dict]
+) -> None:
+    api_response = DataloaderResponseModel(items=item_details)
     context = {
-        "dataloader1": DataLoader(batch_load_fn=batch_load_expanded_models),
-        "dataloader2": DataLoader(batch_load_fn=batch_load_expanded_models2),
+        "dataloader1": DataLoader(
+            batch_load_fn=batch_load_nested_expanded_models,
+            cache=False,
+            max_batch_size=64,
+        ),
+        "dataloader2": DataLoader(
+            batch_load_fn=batch_load_expanded_models2,
+            cache=False,
+            max_batch_size=64,
+        ),
     }
 
     assert_expected_rendered_fieldset_data(
@@ -343,9 +418,7 @@ def test_dataloader_expansion_nested() -> None:
         {
             "items": [
                 {
-                    "item_id": i,
-                    "expanded_model_id": i + 20,
-                    "fieldA": f"val{i}",
+                    **item,
                     "expanded_model": {
                         "expanded_model_id": i + 20,
                         "expanded_model2_id": i + 40,
@@ -356,7 +429,7 @@ def test_dataloader_expansion_nested() -> None:
                         },
                     },
                 }
-                for i in range(5)
+                for i, item in enumerate(expected_items)
             ]
         },
         context,
@@ -364,163 +437,137 @@ def test_dataloader_expansion_nested() -> None:
 
     # Super important, make sure we are coalescing all the data loader calls, since
     # it is easy to break batching
-    assert loader1_call_count == 1
-    assert loader2_call_count == 1
+    assert _CALL_COUNTS["nested_expanded_models"] == 1
+    assert _CALL_COUNTS["expanded_models2"] == 1
 
 
-def test_merge_upwards_models() -> None:
-    class ExpandedModel(BaseModel):
-        thing: str
-        thing2: str
+class MergeUpwardsModelsExpandedModel(BaseModel):
+    thing: str
+    thing2: str
 
-    class ResponseModel(BaseModel):
-        def get_zoom(self, context: Any) -> ExpandedModel:
-            return ExpandedModel(thing="what!", thing2="red")
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(
-                    expansion_method_name="get_zoom", merge_fields_upwards=True
-                )
-            }
-        )
+class MergeUpwardsNestedSubExpandedModel(BaseModel):
+    field1: str
+    field2: str
 
-    api_response = ResponseModel()
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field2"]})
 
-    assert_expected_rendered_fieldset_data(
-        api_response, ["zoom.field1", "zoom"], {"thing": "what!", "thing2": "red"}
-    )
 
+class MergeUpwardsNestedExpandedModel(BaseModel):
+    thing: str
+    thing2: str
 
-def test_merge_upwards_dict() -> None:
-    class ResponseModel(BaseModel):
-        def get_zoom(self, context: Any) -> dict:
-            return {"thing": "what!", "thing2": "red"}
+    def get_sub(self, context: Any) -> MergeUpwardsNestedSubExpandedModel:
+        return MergeUpwardsNestedSubExpandedModel(field1="f1", field2="f2")
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(
-                    expansion_method_name="get_zoom", merge_fields_upwards=True
-                )
-            }
-        )
-
-    api_response = ResponseModel()
-
-    assert_expected_rendered_fieldset_data(
-        api_response, ["zoom"], {"thing": "what!", "thing2": "red"}
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "sub": ModelExpansion(
+                expansion_method_name="get_sub", merge_fields_upwards=True
+            )
+        }
     )
 
 
-def test_merge_upwards_nested_models() -> None:
-    class SubExpandedModel(BaseModel):
-        field1: str
-        field2: str
-
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field2"]})
+class MergeUpwardsNestedDictsExpandedModel(BaseModel):
+    thing: str
+    thing2: str
 
-    class ExpandedModel(BaseModel):
-        thing: str
-        thing2: str
+    def get_sub(self, context: Any) -> dict:
+        return {"field1": "f1", "field2": "f2"}
 
-        def get_sub(self, context: Any) -> SubExpandedModel:
-            return SubExpandedModel(field1="f1", field2="f2")
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "sub": ModelExpansion(
+                expansion_method_name="get_sub", merge_fields_upwards=True
+            )
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "sub": ModelExpansion(
-                    expansion_method_name="get_sub", merge_fields_upwards=True
-                )
-            }
-        )
 
-    class ResponseModel(BaseModel):
-        def get_zoom(self, context: Any) -> ExpandedModel:
-            return ExpandedModel(thing="what!", thing2="red")
+class MergeUpwardsResponseModel(BaseModel):
+    def get_zoom(self, context: Any) -> Any:
+        variant = context["variant"]
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(
-                    expansion_method_name="get_zoom", merge_fields_upwards=True
-                )
-            }
-        )
+        if variant == "models":
+            return MergeUpwardsModelsExpandedModel(thing="what!", thing2="red")
+        if variant == "dict":
+            return {"thing": "what!", "thing2": "red"}
+        if variant == "nested_models":
+            return MergeUpwardsNestedExpandedModel(thing="what!", thing2="red")
+        if variant == "nested_dicts":
+            return MergeUpwardsNestedDictsExpandedModel(thing="what!", thing2="red")
 
-    api_response = ResponseModel()
+        raise ValueError(f"Unknown variant {variant}")
 
-    assert_expected_rendered_fieldset_data(
-        api_response, ["zoom.sub.field1"], {"zoom": {"field1": "f1", "field2": "f2"}}
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "zoom": ModelExpansion(
+                expansion_method_name="get_zoom", merge_fields_upwards=True
+            )
+        }
     )
 
 
-def test_merge_upwards_nested_dicts() -> None:
-    class ExpandedModel(BaseModel):
-        thing: str
-        thing2: str
+@pytest.mark.parametrize(
+    "variant, fields, expected",
+    [
+        ("models", ["zoom.field1", "zoom"], {"thing": "what!", "thing2": "red"}),
+        ("dict", ["zoom"], {"thing": "what!", "thing2": "red"}),
+        (
+            "nested_models",
+            ["zoom.sub.field1"],
+            {"zoom": {"field1": "f1", "field2": "f2"}},
+        ),
+        (
+            "nested_dicts",
+            ["zoom.sub.field1"],
+            {"zoom": {"field1": "f1", "field2": "f2"}},
+        ),
+    ],
+)
+def test_merge_upwards(variant: str, fields: List[str], expected: dict) -> None:
+    assert_expected_rendered_fieldset_data(
+        MergeUpwardsResponseModel(), fields, expected, {"variant": variant}
+    )
 
-        def get_sub(self, context: Any) -> dict:
-            return {"field1": "f1", "field2": "f2"}
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "sub": ModelExpansion(
-                    expansion_method_name="get_sub", merge_fields_upwards=True
-                )
-            }
-        )
+class ScalarResponseModel(BaseModel):
+    def get_zoom(self, context: Any) -> str:
+        return "some scalar value"
 
-    class ResponseModel(BaseModel):
-        def get_zoom(self, context: Any) -> ExpandedModel:
-            return ExpandedModel(thing="what!", thing2="red")
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={"zoom": ModelExpansion(expansion_method_name="get_zoom")}
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(
-                    expansion_method_name="get_zoom", merge_fields_upwards=True
-                )
-            }
-        )
 
-    api_response = ResponseModel()
+def test_expand_to_scalar_value() -> None:
+    api_response = ScalarResponseModel()
 
     assert_expected_rendered_fieldset_data(
-        api_response, ["zoom.sub.field1"], {"zoom": {"field1": "f1", "field2": "f2"}}
+        api_response, ["zoom"], {"zoom": "some scalar value"}
     )
 
 
-def test_expand_to_scalar_value() -> None:
-    class ResponseModel(BaseModel):
-        def get_zoom(self, context: Any) -> str:
-            return "some scalar value"
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"zoom": ModelExpansion(expansion_method_name="get_zoom")}
-        )
-
-    api_response = ResponseModel()
+class ScalarMergeSubModel(BaseModel):
+    def get_zoom(self, context: Any) -> str:
+        return "some scalar value"
 
-    assert_expected_rendered_fieldset_data(
-        api_response, ["zoom"], {"zoom": "some scalar value"}
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "zoom": ModelExpansion(
+                expansion_method_name="get_zoom", merge_fields_upwards=True
+            )
+        }
     )
 
 
-def test_expand_to_scalar_value_with_merge() -> None:
-    class SubModel(BaseModel):
-        def get_zoom(self, context: Any) -> str:
-            return "some scalar value"
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "zoom": ModelExpansion(
-                    expansion_method_name="get_zoom", merge_fields_upwards=True
-                )
-            }
-        )
+class ScalarMergeResponseModel(BaseModel):
+    sub: ScalarMergeSubModel
 
-    class ResponseModel(BaseModel):
-        sub: SubModel
 
-    api_response = ResponseModel(sub=SubModel())
+def test_expand_to_scalar_value_with_merge() -> None:
+    api_response = ScalarMergeResponseModel(sub=ScalarMergeSubModel())
 
     with pytest.raises(ValueError) as exc:
         assert_expected_rendered_fieldset_data(api_response, ["sub.zoom"], {})
@@ -528,36 +575,41 @@ def test_expand_to_scalar_value_with_merge() -> None:
     assert "merge_fields_upwards=True" in str(exc.value)
 
 
-def test_merge_upwards_lists() -> None:
-    class SubExpandedModel(BaseModel):
-        field1: str
-        field2: str
+class MergeUpwardsListsSubExpandedModel(BaseModel):
+    field1: str
+    field2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field2"]})
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field2"]})
 
-    class SubModel(BaseModel):
-        thing: str
-        thing2: str
 
-        def get_sub(self, context: Any) -> SubExpandedModel:
-            return SubExpandedModel(field1=self.thing + "f1", field2=self.thing2 + "f2")
+class MergeUpwardsListsSubModel(BaseModel):
+    thing: str
+    thing2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["thing", "thing2"],
-                "sub": ModelExpansion(
-                    expansion_method_name="get_sub", merge_fields_upwards=True
-                ),
-            }
+    def get_sub(self, context: Any) -> MergeUpwardsListsSubExpandedModel:
+        return MergeUpwardsListsSubExpandedModel(
+            field1=self.thing + "f1", field2=self.thing2 + "f2"
         )
 
-    class ResponseModel(BaseModel):
-        items: List[SubModel]
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["thing", "thing2"],
+            "sub": ModelExpansion(
+                expansion_method_name="get_sub", merge_fields_upwards=True
+            ),
+        }
+    )
+
+
+class MergeUpwardsListsResponseModel(BaseModel):
+    items: List[MergeUpwardsListsSubModel]
 
-    api_response = ResponseModel(
+
+def test_merge_upwards_lists() -> None:
+    api_response = MergeUpwardsListsResponseModel(
         items=[
-            SubModel(thing="t1", thing2="t2"),
-            SubModel(thing="t3", thing2="t4"),
+            MergeUpwardsListsSubModel(thing="t1", thing2="t2"),
+            MergeUpwardsListsSubModel(thing="t3", thing2="t4"),
         ]
     )
 
@@ -581,30 +633,32 @@ def test_merge_upwards_lists() -> None:
     )
 
 
-def test_expansion_returns_list() -> None:
-    class ExpandedModel(BaseModel):
-        field1: str
+class ListExpandedModel(BaseModel):
+    field1: str
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
 
-    class ResponseModel(BaseModel):
-        f1: str
 
-        def get_sub(self, context: Any) -> List[ExpandedModel]:
-            return [
-                ExpandedModel(field1="field1value1"),
-                ExpandedModel(field1="field1value2"),
-                ExpandedModel(field1="field1value3"),
-            ]
+class ListResponseModel(BaseModel):
+    f1: str
+
+    def get_sub(self, context: Any) -> List[ListExpandedModel]:
+        return [
+            ListExpandedModel(field1="field1value1"),
+            ListExpandedModel(field1="field1value2"),
+            ListExpandedModel(field1="field1value3"),
+        ]
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["f1"],
+            "sub": ModelExpansion(expansion_method_name="get_sub"),
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["f1"],
-                "sub": ModelExpansion(expansion_method_name="get_sub"),
-            }
-        )
 
-    api_response = ResponseModel(f1="f1value")
+def test_expansion_returns_list() -> None:
+    api_response = ListResponseModel(f1="f1value")
 
     assert_expected_rendered_fieldset_data(
         api_response,
@@ -620,107 +674,120 @@ def test_expansion_returns_list() -> None:
     )
 
 
-def test_expansion_returns_list_nested() -> None:
-    class SubExpandedModel(BaseModel):
-        subfield1: str
+class ListNestedSubExpandedModel(BaseModel):
+    subfield1: str
 
-    class ExpandedModel(BaseModel):
-        field1: str
 
-        def get_subsub(self, context: Any) -> List[SubExpandedModel]:
-            return [
-                SubExpandedModel(subfield1=f"{self.field1}_subvalue1"),
-                SubExpandedModel(subfield1=f"{self.field1}_subvalue2"),
-                SubExpandedModel(subfield1=f"{self.field1}_subvalue3"),
-            ]
+class ListNestedExpandedModel(BaseModel):
+    field1: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field1"],
-                "subsub": ModelExpansion(expansion_method_name="get_subsub"),
-            }
-        )
+    def get_subsub(self, context: Any) -> List[ListNestedSubExpandedModel]:
+        return [
+            ListNestedSubExpandedModel(subfield1=f"{self.field1}_subvalue1"),
+            ListNestedSubExpandedModel(subfield1=f"{self.field1}_subvalue2"),
+            ListNestedSubExpandedModel(subfield1=f"{self.field1}_subvalue3"),
+        ]
 
-    class ResponseModel(BaseModel):
-        f1: str
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+            "subsub": ModelExpansion(expansion_method_name="get_subsub"),
+        }
+    )
 
-        def get_sub(self, context: Any) -> List[ExpandedModel]:
-            return [
-                ExpandedModel(field1="field1value1"),
-                ExpandedModel(field1="field1value2"),
-                ExpandedModel(field1="field1value3"),
-            ]
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["f1"],
-                "sub": ModelExpansion(expansion_method_name="get_sub"),
-            }
-        )
+class ListNestedResponseModel(BaseModel):
+    f1: str
 
-    api_response = ResponseModel(f1="f1value")
+    def get_sub(self, context: Any) -> List[ListNestedExpandedModel]:
+        return [
+            ListNestedExpandedModel(field1="field1value1"),
+            ListNestedExpandedModel(field1="field1value2"),
+            ListNestedExpandedModel(field1="field1value3"),
+        ]
 
-    assert_expected_rendered_fieldset_data(
-        api_response,
-        ["sub", "sub.subsub"],
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["f1"],
+            "sub": ModelExpansion(expansion_method_name="get_sub"),
+        }
+    )
+
+
+_EXPECTED_LIST_NESTED = {
+    "f1": "f1value",
+    "sub": [
         {
-            "f1": "f1value",
-            "sub": [
-                {
-                    "field1": "field1value1",
-                    "subsub": [
-                        {"subfield1": "field1value1_subvalue1"},
-                        {"subfield1": "field1value1_subvalue2"},
-                        {"subfield1": "field1value1_subvalue3"},
-                    ],
-                },
-                {
-                    "field1": "field1value2",
-                    "subsub": [
-                        {"subfield1": "field1value2_subvalue1"},
-                        {"subfield1": "field1value2_subvalue2"},
-                        {"subfield1": "field1value2_subvalue3"},
-                    ],
-                },
-                {
-                    "field1": "field1value3",
-                    "subsub": [
-                        {"subfield1": "field1value3_subvalue1"},
-                        {"subfield1": "field1value3_subvalue2"},
-                        {"subfield1": "field1value3_subvalue3"},
-                    ],
-                },
+            "field1": "field1value1",
+            "subsub": [
+                {"subfield1": "field1value1_subvalue1"},
+                {"subfield1": "field1value1_subvalue2"},
+                {"subfield1": "field1value1_subvalue3"},
+            ],
+        },
+        {
+            "field1": "field1value2",
+            "subsub": [
+                {"subfield1": "field1value2_subvalue1"},
+                {"subfield1": "field1value2_subvalue2"},
+                {"subfield1": "field1value2_subvalue3"},
+            ],
+        },
+        {
+            "field1": "field1value3",
+            "subsub": [
+                {"subfield1": "field1value3_subvalue1"},
+                {"subfield1": "field1value3_subvalue2"},
+                {"subfield1": "field1value3_subvalue3"},
             ],
         },
+    ],
+}
+
+
+def test_expansion_returns_list_nested() -> None:
+    api_response = ListNestedResponseModel(f1="f1value")
+
+    assert_expected_rendered_fieldset_data(
+        api_response,
+        ["sub", "sub.subsub"],
+        _EXPECTED_LIST_NESTED,
     )
 
 
-def test_expansion_returns_list_of_list() -> None:
-    class ExpandedModel(BaseModel):
-        field1: str
+class ListOfListExpandedModel(BaseModel):
+    field1: str
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
 
-    class ResponseModel(BaseModel):
-        f1: str
 
-        def get_sub(self, context: Any) -> List[List[ExpandedModel]]:
-            return [
-                [
-                    ExpandedModel(field1="field1value1"),
-                    ExpandedModel(field1="field1value2"),
-                ],
-                [ExpandedModel(field1="field1value3")],
-            ]
+# Kept as lists rather than tuples, since list-of-list results are what
+# the test covers
+_LIST_OF_LIST = [
+    [
+        ListOfListExpandedModel(field1="field1value1"),
+        ListOfListExpandedModel(field1="field1value2"),
+    ],
+    [ListOfListExpandedModel(field1="field1value3")],
+]
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["f1"],
-                "sub": ModelExpansion(expansion_method_name="get_sub"),
-            }
-        )
 
-    api_response = ResponseModel(f1="f1value")
+class ListOfListResponseModel(BaseModel):
+    f1: str
+
+    def get_sub(self, context: Any) -> List[List[ListOfListExpandedModel]]:
+        return _LIST_OF_LIST
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["f1"],
+            "sub": ModelExpansion(expansion_method_name="get_sub"),
+        }
+    )
+
+
+def test_expansion_returns_list_of_list() -> None:
+    api_response = ListOfListResponseModel(f1="f1value")
 
     assert_expected_rendered_fieldset_data(
         api_response,
@@ -735,21 +802,22 @@ def test_expansion_returns_list_of_list() -> None:
     )
 
 
-def test_expand_empty_list() -> None:
-    class ResponseModel(BaseModel):
-        f1: str
+class EmptyListResponseModel(BaseModel):
+    f1: str
 
-        def get_sub(self, context: Any) -> List[int]:
-            return []
+    def get_sub(self, context: Any) -> List[int]:
+        return []
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["f1"],
+            "sub": ModelExpansion(expansion_method_name="get_sub"),
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["f1"],
-                "sub": ModelExpansion(expansion_method_name="get_sub"),
-            }
-        )
 
-    api_response = ResponseModel(f1="f1value")
+def test_expand_empty_list() -> None:
+    api_response = EmptyListResponseModel(f1="f1value")
 
     assert_expected_rendered_fieldset_data(
         api_response,
@@ -758,38 +826,39 @@ def test_expand_empty_list() -> None:
     )
 
 
-def test_expansion_in_default_fieldset() -> None:
-    class SubModelBase(BaseModel):
-        f1: str
-
-    class SubModel(SubModelBase):
-        f2: str
-        f3: str
-        f4: str
-        f5: str
-        f6: str
-        f7: str
-
-        def get_sub(self, context: Any) -> str:
-            return "sub" + self.f1
-
-        model_config = ConfigDict(from_attributes=True)
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["f1", "f2", "sub"],
-                "g1": ["f3"],
-                "g2": ["f4", "f5"],
-                "sub": ModelExpansion(expansion_method_name="get_sub"),
-            }
-        )
+class InDefaultSubModelBase(BaseModel):
+    f1: str
+
+
+class InDefaultSubModel(InDefaultSubModelBase):
+    f2: str
+    f3: str
+    f4: str
+    f5: str
+    f6: str
+    f7: str
+
+    def get_sub(self, context: Any) -> str:
+        return "sub" + self.f1
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["f1", "f2", "sub"],
+            "g1": ["f3"],
+            "g2": ["f4", "f5"],
+            "sub": ModelExpansion(expansion_method_name="get_sub"),
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        subs: List[SubModel]
 
-    response = ResponseModel(
+class InDefaultResponseModel(BaseModel):
+    subs: List[InDefaultSubModel]
+
+
+def test_expansion_in_default_fieldset() -> None:
+    response = InDefaultResponseModel(
         subs=[
-            SubModel(
+            InDefaultSubModel(
                 f1="f1.1",
                 f2="f1.2",
                 f3="f1.3",
@@ -798,7 +867,7 @@ def test_expansion_in_default_fieldset() -> None:
                 f6="f1.6",
                 f7="f1.7",
             ),
-            SubModel(
+            InDefaultSubModel(
                 f1="f2.1",
                 f2="f2.2",
                 f3="f2.3",
@@ -840,58 +909,72 @@ def test_expansion_in_default_fieldset() -> None:
     )
 
 
-def test_nested_array_expansion_overlap() -> None:
-    # Expansions should not overwrite request fields where the request
-    # field is a standalone field not part of other fieldset groups
+_NOW = datetime.datetime(2024, 1, 1, 0, 0, 0)
 
-    class SubEntity(BaseModel):
-        addr: str
 
-    class Struct(BaseModel):
-        num_stuff: int
+class OverlapSubEntity(BaseModel):
+    addr: str
 
-    class Entity(BaseModel):
-        entity_id: str
-        structure: Optional[Struct]
-        created: datetime.datetime
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["entity_id"],
-                "sub_entity": ModelExpansion(
-                    response_model=SubEntity, expansion_method_name="get_sub_entity"
-                ),
-                "timestamps": ["created"],
-            }
-        )
+class OverlapStruct(BaseModel):
+    num_stuff: int
+
 
-        def get_sub_entity(self, context: Any) -> SubEntity:
-            return SubEntity(addr="somewhere")
+class OverlapEntity(BaseModel):
+    entity_id: str
+    structure: Optional[OverlapStruct]
+    created: datetime.datetime
 
-    now = datetime.datetime.now()
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["entity_id"],
+            "sub_entity": ModelExpansion(
+                response_model=OverlapSubEntity,
+                expansion_method_name="get_sub_entity",
+            ),
+            "timestamps": ["created"],
+        }
+    )
 
-    class Thing(BaseModel):
-        thing_id: str
+    def get_sub_entity(self, context: Any) -> OverlapSubEntity:
+        return OverlapSubEntity(addr="somewhere")
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["thing_id"],
-                "entities": ModelExpansion(
-                    response_model=List[Entity],
-                    expansion_method_name="get_entities",
-                ),
-            }
-        )
 
-        def get_entities(self, context: Any) -> List[Entity]:
-            return [
-                Entity(entity_id="foo", structure=Struct(num_stuff=11), created=now)
-            ]
+_ENTITIES = [
+    OverlapEntity.model_construct(
+        entity_id="foo",
+        structure=OverlapStruct.model_construct(num_stuff=11),
+        created=_NOW,
+    )
+]
 
-    class Response(BaseModel):
-        thing: Thing
 
-    response = Response(thing=Thing(thing_id="bar"))
+class OverlapThing(BaseModel):
+    thing_id: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["thing_id"],
+            "entities": ModelExpansion(
+                expansion_method_name="get_entities",
+            ),
+        }
+    )
+
+    def get_entities(self, context: Any) -> List[OverlapEntity]:
+        return _ENTITIES
+
+
+class OverlapResponse(BaseModel):
+    thing: OverlapThing
+
+
+def test_nested_array_expansion_overlap() -> None:
+    # Expansions should not overwrite request fields where the request
+    # field is a standalone field not part of other fieldset groups
+    response = OverlapResponse.model_construct(
+        thing=OverlapThing.model_construct(thing_id="bar")
+    )
 
     assert_expected_rendered_fieldset_data(
         response,
@@ -912,7 +995,7 @@ def test_nested_array_expansion_overlap() -> None:
                         "structure": {
                             "num_stuff": 11,
                         },
-                        "created": now,
+                        "created": _NOW,
                     }
                 ],
             }
@@ -920,102 +1003,173 @@ def test_nested_array_expansion_overlap() -> None:
     )
 
 
-def test_nested_expansion_dict_vary_keys() -> None:
-    class Storey(BaseModel):
-        s_attr1: str
-        component_counts: Optional[Dict[str, int]]
+class VaryKeysStorey(BaseModel):
+    s_attr1: str
+    component_counts: Optional[Dict[str, int]]
 
-    class ItemStructure(BaseModel):
-        attr1: str
-        storeys: List[Storey] = Field(min_length=1)
 
-    class Item(BaseModel):
-        item_id: str
-        structure: Optional[ItemStructure] = None
+class VaryKeysItemStructure(BaseModel):
+    attr1: str
+    storeys: List[VaryKeysStorey] = Field(min_length=1)
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["item_id"],
-            }
-        )
 
-    class Thing(BaseModel):
-        thing_id: str
+class VaryKeysItem(BaseModel):
+    item_id: str
+    structure: Optional[VaryKeysItemStructure] = None
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["item_id"],
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["thing_id"],
-                "items": ModelExpansion(
-                    response_model=List[Item],
-                    expansion_method_name="get_items",
-                ),
-            }
-        )
 
-        def get_items(self, context: Any) -> List[Item]:
-            return [
-                Item(
-                    item_id="1234",
-                    structure=ItemStructure(
-                        attr1="a_val1",
-                        storeys=[
-                            Storey(
-                                s_attr1="Floor 1-1",
-                                component_counts={
-                                    "key11": 11,
-                                    "key12": 12,
-                                },
-                            ),
-                            Storey(
-                                s_attr1="Floor 1-2",
-                                component_counts={
-                                    "key21": 21,
-                                    "key22": 22,
-                                    "key23": 23,
-                                },
-                            ),
-                        ],
-                    ),
+_ITEMS = [
+    VaryKeysItem.model_construct(
+        item_id="1234",
+        structure=VaryKeysItemStructure.model_construct(
+            attr1="a_val1",
+            storeys=[
+                VaryKeysStorey.model_construct(
+                    s_attr1="Floor 1-1",
+                    component_counts={
+                        "key11": 11,
+                        "key12": 12,
+                    },
                 ),
-                Item(
-                    item_id="5678",
-                    structure=ItemStructure(
-                        attr1="a_val2",
-                        storeys=[
-                            Storey(
-                                s_attr1="Floor 2-1",
-                                component_counts={
-                                    "key211": 211,
-                                    "key212": 212,
-                                },
-                            ),
-                            Storey(
-                                s_attr1="Floor 2-2",
-                                component_counts={
-                                    "key221": 221,
-                                    "key222": 222,
-                                    "key223": 223,
-                                },
-                            ),
-                            Storey(
-                                s_attr1="Floor 3-2",
-                                component_counts={
-                                    "key321": 321,
-                                    "key322": 322,
-                                    "key323": 323,
-                                    "key324": 324,
-                                },
-                            ),
-                        ],
-                    ),
+                VaryKeysStorey.model_construct(
+                    s_attr1="Floor 1-2",
+                    component_counts={
+                        "key21": 21,
+                        "key22": 22,
+                        "key23": 23,
+                    },
                 ),
-            ]
+            ],
+        ),
+    ),
+    VaryKeysItem.model_construct(
+        item_id="5678",
+        structure=VaryKeysItemStructure.model_construct(
+            attr1="a_val2",
+            storeys=[
+                VaryKeysStorey.model_construct(
+                    s_attr1="Floor 2-1",
+                    component_counts={
+                        "key211": 211,
+                        "key212": 212,
+                    },
+                ),
+                VaryKeysStorey.model_construct(
+                    s_attr1="Floor 2-2",
+                    component_counts={
+                        "key221": 221,
+                        "key222": 222,
+                        "key223": 223,
+                    },
+                ),
+                VaryKeysStorey.model_construct(
+                    s_attr1="Floor 3-2",
+                    component_counts={
+                        "key321": 321,
+                        "key322": 322,
+                        "key323": 323,
+                        "key324": 324,
+                    },
+                ),
+            ],
+        ),
+    ),
+]
+
+
+class VaryKeysThing(BaseModel):
+    thing_id: str
 
-    class Response(BaseModel):
-        thing: Thing
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["thing_id"],
+            "items": ModelExpansion(
+                expansion_method_name="get_items",
+            ),
+        }
+    )
 
-    response = Response(
-        thing=Thing(
+    def get_items(self, context: Any) -> List[VaryKeysItem]:
+        return _ITEMS
+
+
+class VaryKeysResponse(BaseModel):
+    thing: VaryKeysThing
+
+
+_EXPECTED_VARY_KEYS = {
+    "thing": {
+        "thing_id": "abc",
+        "items": [
+            {
+                "item_id": "1234",
+                "structure": {
+                    "attr1": "a_val1",
+                    "storeys": [
+                        {
+                            "s_attr1": "Floor 1-1",
+                            "component_counts": {
+                                "key11": 11,
+                                "key12": 12,
+                            },
+                        },
+                        {
+                            "s_attr1": "Floor 1-2",
+                            "component_counts": {
+                                "key21": 21,
+                                "key22": 22,
+                                "key23": 23,
+                            },
+                        },
+                    ],
+                },
+            },
+            {
+                "item_id": "5678",
+                "structure": {
+                    "attr1": "a_val2",
+                    "storeys": [
+                        {
+                            "s_attr1": "Floor 2-1",
+                            "component_counts": {
+                                "key211": 211,
+                                "key212": 212,
+                            },
+                        },
+                        {
+                            "s_attr1": "Floor 2-2",
+                            "component_counts": {
+                                "key221": 221,
+                                "key222": 222,
+                                "key223": 223,
+                            },
+                        },
+                        {
+                            "s_attr1": "Floor 3-2",
+                            "component_counts": {
+                                "key321": 321,
+                                "key322": 322,
+                                "key323": 323,
+                                "key324": 324,
+                            },
+                        },
+                    ],
+                },
+            },
+        ],
+    }
+}
+
+
+def test_nested_expansion_dict_vary_keys() -> None:
+    response = VaryKeysResponse(
+        thing=VaryKeysThing(
             thing_id="abc",
         )
     )
@@ -1025,102 +1179,44 @@ def test_nested_expansion_dict_vary_keys() -> None:
         [
             "thing.items.structure",
         ],
-        {
-            "thing": {
-                "thing_id": "abc",
-                "items": [
-                    {
-                        "item_id": "1234",
-                        "structure": {
-                            "attr1": "a_val1",
-                            "storeys": [
-                                {
-                                    "s_attr1": "Floor 1-1",
-                                    "component_counts": {
-                                        "key11": 11,
-                                        "key12": 12,
-                                    },
-                                },
-                                {
-                                    "s_attr1": "Floor 1-2",
-                                    "component_counts": {
-                                        "key21": 21,
-                                        "key22": 22,
-                                        "key23": 23,
-                                    },
-                                },
-                            ],
-                        },
-                    },
-                    {
-                        "item_id": "5678",
-                        "structure": {
-                            "attr1": "a_val2",
-                            "storeys": [
-                                {
-                                    "s_attr1": "Floor 2-1",
-                                    "component_counts": {
-                                        "key211": 211,
-                                        "key212": 212,
-                                    },
-                                },
-                                {
-                                    "s_attr1": "Floor 2-2",
-                                    "component_counts": {
-                                        "key221": 221,
-                                        "key222": 222,
-                                        "key223": 223,
-                                    },
-                                },
-                                {
-                                    "s_attr1": "Floor 3-2",
-                                    "component_counts": {
-                                        "key321": 321,
-                                        "key322": 322,
-                                        "key323": 323,
-                                        "key324": 324,
-                                    },
-                                },
-                            ],
-                        },
-                    },
-                ],
-            }
-        },
+        _EXPECTED_VARY_KEYS,
     )
 
 
-def test_dict_nested_list_dicts() -> None:
-    class Thing(BaseModel):
-        str1: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["str1"],
-                "subdata": ModelExpansion(
-                    response_model=Optional[Dict[str, Any]],
-                    expansion_method_name="get_subdata",
-                ),
-            }
-        )
+class NestedListDictsThing(BaseModel):
+    str1: str
 
-        def get_subdata(self, *args: Any, **kwargs: Any) -> Optional[Dict[str, Any]]:
-            return {
-                "list": [
-                    {
-                        "a": "b",
-                    }
-                ]
-            }
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["str1"],
+            "subdata": ModelExpansion(
+                response_model=Optional[Dict[str, Any]],
+                expansion_method_name="get_subdata",
+            ),
+        }
+    )
 
-    class ThingContainer(BaseModel):
-        things: List[Thing]
+    def get_subdata(self, *args: Any, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        _CALL_COUNTS["subdata"] += 1
+        return {
+            "list": [
+                {
+                    "a": "b",
+                }
+            ]
+        }
 
-    thing = Thing(
+
+class NestedListDictsThingContainer(BaseModel):
+    things: List[NestedListDictsThing]
+
+
+def test_dict_nested_list_dicts() -> None:
+    thing = NestedListDictsThing(
         str1="foo",
     )
 
-    things = ThingContainer(things=[thing, thing])
+    things = NestedListDictsThingContainer(things=[thing, thing])
 
     assert_expected_rendered_fieldset_data(
         things,
@@ -1150,3 +1246,6 @@ def test_dict_nested_list_dicts() -> None:
             ]
         },
     )
+
+    # both list entries are the same instance, its expansion only runs once
+    assert _CALL_COUNTS["subdata"] == 1
@@ -1,51 +1,61 @@
+from dataclasses import dataclass
 from typing import Any, ClassVar, Dict, List, Optional
 
 import pytest
-from pydantic import BaseModel
-
-from pydantic_enhanced_serializer import FieldsetConfig
+from pydantic import BaseModel, computed_field
+
+from pydantic_enhanced_serializer import FieldsetConfig, ModelExpansion
+from pydantic_enhanced_serializer.fieldsets import (
+    fieldset_to_includes,
+    model_default_fields,
+    model_named_fieldsets,
+    model_renders_all_fields,
+)
 
 from .utils import assert_expected_rendered_fieldset_data
 
 
+class NoConfigLevel2Item(BaseModel):
+    l2var1: str
+    l2var2: int
+    l2var3: str
+
+
+class NoConfigLevel2ListItem(BaseModel):
+    l2lvar1: str
+    l2lvar2: str
+
+
+class NoConfigLevel1Response(BaseModel):
+    var1: str
+    var2: str
+    var3: int
+    var4: int
+    item: NoConfigLevel2Item
+    items: List[NoConfigLevel2ListItem]
+
+
 def test_no_config_default_behaviour() -> None:
-    class Level2Item(BaseModel):
-        l2var1: str
-        l2var2: int
-        l2var3: str
-
-    class Level2ListItem(BaseModel):
-        l2lvar1: str
-        l2lvar2: str
-
-    class Level1Response(BaseModel):
-        var1: str
-        var2: str
-        var3: int
-        var4: int
-        item: Level2Item
-        items: List[Level2ListItem]
-
-    response = Level1Response(
+    response = NoConfigLevel1Response.model_construct(
         var1="foo",
         var2="bar",
         var3=3,
         var4=4,
-        item=Level2Item(
+        item=NoConfigLevel2Item.model_construct(
             l2var1="l21",
             l2var2=2,
             l2var3="123",
         ),
         items=[
-            Level2ListItem(
+            NoConfigLevel2ListItem.model_construct(
                 l2lvar1="l2l1",
                 l2lvar2="l2l2",
             ),
-            Level2ListItem(
+            NoConfigLevel2ListItem.model_construct(
                 l2lvar1="l2l1B",
                 l2lvar2="l2l2B",
             ),
-            Level2ListItem(
+            NoConfigLevel2ListItem.model_construct(
                 l2lvar1="l2l1C",
                 l2lvar2="l2l2C",
             ),
@@ -83,6 +93,21 @@ def test_no_config_default_behaviour() -> None:
     )
 
 
+class SingleNoConfigResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+
+
+@pytest.fixture(scope="module")
+def single_no_config_response() -> SingleNoConfigResponseModel:
+    return SingleNoConfigResponseModel.model_construct(
+        field1="one",
+        field2="two",
+        field3="three",
+    )
+
+
 # Zero config means always return ALL fields
 @pytest.mark.parametrize(
     "fields,expected",
@@ -104,23 +129,40 @@ def test_no_config_default_behaviour() -> None:
             {"field1": "one", "field2": "two", "field3": "three"},
         ),
     ),
+    ids=[
+        "no_fields",
+        "field1",
+        "field1+field2",
+        "field1+field2+field3",
+        "no_such_field",
+        "no_such_field+field1",
+        "no_such_field+field1+field2",
+    ],
 )
 def test_single_level_by_field_name_no_config(
-    fields: List[str], expected: dict
+    single_no_config_response: SingleNoConfigResponseModel,
+    fields: List[str],
+    expected: dict,
 ) -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+    assert_expected_rendered_fieldset_data(single_no_config_response, fields, expected)
+
+
+class SingleAnyConfigResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
 
-    response = ResponseModel(
+
+@pytest.fixture(scope="module")
+def single_any_config_response() -> SingleAnyConfigResponseModel:
+    return SingleAnyConfigResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
     )
 
-    assert_expected_rendered_fieldset_data(response, fields, expected)
-
 
 # Any config means all fields must be asked for or NONE are returned
 @pytest.mark.parametrize(
@@ -137,25 +179,40 @@ def test_single_level_by_field_name_no_config(
         (["no_such_field", "field1"], {"field1": "one"}),
         (["no_such_field", "field1", "field2"], {"field1": "one", "field2": "two"}),
     ),
+    ids=[
+        "no_fields",
+        "field1",
+        "field1+field2",
+        "field1+field2+field3",
+        "no_such_field",
+        "no_such_field+field1",
+        "no_such_field+field1+field2",
+    ],
 )
 def test_single_level_by_field_name_any_config(
-    fields: List[str], expected: dict
+    single_any_config_response: SingleAnyConfigResponseModel,
+    fields: List[str],
+    expected: dict,
 ) -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+    assert_expected_rendered_fieldset_data(single_any_config_response, fields, expected)
+
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
+class SingleSubsetDefaultResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
 
-    response = ResponseModel(
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field3"]})
+
+
+@pytest.fixture(scope="module")
+def single_subset_default_response() -> SingleSubsetDefaultResponseModel:
+    return SingleSubsetDefaultResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
     )
 
-    assert_expected_rendered_fieldset_data(response, fields, expected)
-
 
 # Default fieldset always returned regardless of other args
 @pytest.mark.parametrize(
@@ -175,72 +232,96 @@ def test_single_level_by_field_name_any_config(
             {"field1": "one", "field2": "two", "field3": "three"},
         ),
     ),
+    ids=[
+        "no_fields",
+        "field1",
+        "field1+field2",
+        "field1+field2+field3",
+        "no_such_field",
+        "no_such_field+field1",
+        "no_such_field+field1+field2",
+    ],
 )
 def test_single_level_by_field_subset_default(
-    fields: List[str], expected: dict
+    single_subset_default_response: SingleSubsetDefaultResponseModel,
+    fields: List[str],
+    expected: dict,
 ) -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field3"]})
-
-    response = ResponseModel(
-        field1="one",
-        field2="two",
-        field3="three",
+    assert_expected_rendered_fieldset_data(
+        single_subset_default_response, fields, expected
     )
 
-    assert_expected_rendered_fieldset_data(response, fields, expected)
 
+class NamedResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
 
-def test_named_fieldset() -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={"fset1": ["field3"], "fset2": ["field1", "field2"]}
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"fset1": ["field3"], "fset2": ["field1", "field2"]}
-        )
 
-    response = ResponseModel(
+@pytest.fixture(scope="module")
+def named_response() -> NamedResponseModel:
+    return NamedResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
     )
 
-    assert_expected_rendered_fieldset_data(response, ["fset1"], {"field3": "three"})
+
+def test_named_fieldset(named_response: NamedResponseModel) -> None:
     assert_expected_rendered_fieldset_data(
-        response, ["fset2"], {"field1": "one", "field2": "two"}
+        named_response, ["fset1"], {"field3": "three"}
     )
     assert_expected_rendered_fieldset_data(
-        response,
+        named_response, ["fset2"], {"field1": "one", "field2": "two"}
+    )
+    assert_expected_rendered_fieldset_data(
+        named_response,
         ["fset1", "fset2"],
         {"field1": "one", "field2": "two", "field3": "three"},
     )
 
 
-def test_named_fieldset_and_named_field() -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+def test_named_fieldset_and_named_field(named_response: NamedResponseModel) -> None:
+    assert_expected_rendered_fieldset_data(
+        named_response, ["fset1", "field1"], {"field1": "one", "field3": "three"}
+    )
+
+
+class NestedNoConfigSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"fset1": ["field3"], "fset2": ["field1", "field2"]}
-        )
 
-    response = ResponseModel(
+class NestedNoConfigResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: NestedNoConfigSubModel
+
+
+@pytest.fixture(scope="module")
+def nested_no_config_response() -> NestedNoConfigResponseModel:
+    return NestedNoConfigResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
+        sub=NestedNoConfigSubModel.model_construct(
+            subfield1="sub1",
+            subfield2="sub2",
+        ),
     )
 
-    assert_expected_rendered_fieldset_data(
-        response, ["fset1", "field1"], {"field1": "one", "field3": "three"}
-    )
+
+_NESTED_ALL_FIELDS = {
+    "field1": "one",
+    "field2": "two",
+    "field3": "three",
+    "sub": {"subfield1": "sub1", "subfield2": "sub2"},
+}
 
 
 @pytest.mark.parametrize(
@@ -248,72 +329,68 @@ def test_named_fieldset_and_named_field() -> None:
     (
         (
             [],
-            {
-                "field1": "one",
-                "field2": "two",
-                "field3": "three",
-                "sub": {"subfield1": "sub1", "subfield2": "sub2"},
-            },
+            _NESTED_ALL_FIELDS,
         ),
         (
             ["field1"],
-            {
-                "field1": "one",
-                "field2": "two",
-                "field3": "three",
-                "sub": {"subfield1": "sub1", "subfield2": "sub2"},
-            },
+            _NESTED_ALL_FIELDS,
         ),
         (
             ["field1", "sub"],
-            {
-                "field1": "one",
-                "field2": "two",
-                "field3": "three",
-                "sub": {"subfield1": "sub1", "subfield2": "sub2"},
-            },
+            _NESTED_ALL_FIELDS,
         ),
         (
             ["field1", "sub.subfield1"],
-            {
-                "field1": "one",
-                "field2": "two",
-                "field3": "three",
-                "sub": {"subfield1": "sub1", "subfield2": "sub2"},
-            },
+            _NESTED_ALL_FIELDS,
         ),
         (
             ["field1", "sub.subfield1", "sub.subfield2"],
-            {
-                "field1": "one",
-                "field2": "two",
-                "field3": "three",
-                "sub": {"subfield1": "sub1", "subfield2": "sub2"},
-            },
+            _NESTED_ALL_FIELDS,
         ),
     ),
+    ids=[
+        "no_fields",
+        "field1",
+        "field1+sub",
+        "field1+sub.subfield1",
+        "field1+sub.subfield1+sub.subfield2",
+    ],
 )
-def test_nested_by_field_name_no_config_both(fields: List[str], expected: dict) -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
-
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: SubModel
-
-    response = ResponseModel(
+def test_nested_by_field_name_no_config_both(
+    nested_no_config_response: NestedNoConfigResponseModel,
+    fields: List[str],
+    expected: dict,
+) -> None:
+    assert_expected_rendered_fieldset_data(nested_no_config_response, fields, expected)
+
+
+class NestedAnyConfigSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
+
+
+class NestedAnyConfigResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: NestedAnyConfigSubModel
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
+
+
+@pytest.fixture(scope="module")
+def nested_any_config_response() -> NestedAnyConfigResponseModel:
+    return NestedAnyConfigResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
-        sub=SubModel(
+        sub=NestedAnyConfigSubModel.model_construct(
             subfield1="sub1",
             subfield2="sub2",
         ),
     )
-    assert_expected_rendered_fieldset_data(response, fields, expected)
 
 
 @pytest.mark.parametrize(
@@ -328,36 +405,50 @@ def test_nested_by_field_name_no_config_both(fields: List[str], expected: dict)
             {"field1": "one", "sub": {"subfield1": "sub1", "subfield2": "sub2"}},
         ),
     ),
+    ids=[
+        "no_fields",
+        "field1",
+        "field1+sub",
+        "field1+sub.subfield1",
+        "field1+sub.subfield1+sub.subfield2",
+    ],
 )
 def test_nested_by_field_name_any_config_both(
-    fields: List[str], expected: dict
+    nested_any_config_response: NestedAnyConfigResponseModel,
+    fields: List[str],
+    expected: dict,
 ) -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
+    assert_expected_rendered_fieldset_data(nested_any_config_response, fields, expected)
+
+
+class NestedSubsetDefaultSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["subfield2"]})
+
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
+class NestedSubsetDefaultResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: NestedSubsetDefaultSubModel
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: SubModel
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field3"]})
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={})
 
-    response = ResponseModel(
+@pytest.fixture(scope="module")
+def nested_subset_default_response() -> NestedSubsetDefaultResponseModel:
+    return NestedSubsetDefaultResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
-        sub=SubModel(
+        sub=NestedSubsetDefaultSubModel.model_construct(
             subfield1="sub1",
             subfield2="sub2",
         ),
     )
 
-    assert_expected_rendered_fieldset_data(response, fields, expected)
-
 
 # Default fieldset always returned regardless of other args
 @pytest.mark.parametrize(
@@ -371,109 +462,105 @@ def test_nested_by_field_name_any_config_both(
             {"field3": "three", "sub": {"subfield1": "sub1", "subfield2": "sub2"}},
         ),
     ),
+    ids=["no_fields", "field1", "sub", "sub.subfield1"],
 )
-def test_nested_by_field_subset_default(fields: List[str], expected: dict) -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
+def test_nested_by_field_subset_default(
+    nested_subset_default_response: NestedSubsetDefaultResponseModel,
+    fields: List[str],
+    expected: dict,
+) -> None:
+    assert_expected_rendered_fieldset_data(
+        nested_subset_default_response, fields, expected
+    )
+
+
+class NestedInDefaultSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["subfield2"]})
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["subfield2"]})
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: SubModel
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field3"]})
+class NestedInDefaultResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: NestedInDefaultSubModel
 
-    response = ResponseModel(
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field3", "sub"]})
+
+
+@pytest.fixture(scope="module")
+def nested_in_default_response() -> NestedInDefaultResponseModel:
+    return NestedInDefaultResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
-        sub=SubModel(
+        sub=NestedInDefaultSubModel.model_construct(
             subfield1="sub1",
             subfield2="sub2",
         ),
     )
 
-    assert_expected_rendered_fieldset_data(response, fields, expected)
+
+_NESTED_IN_DEFAULT_ONLY = {"field3": "three", "sub": {"subfield2": "sub2"}}
 
 
 @pytest.mark.parametrize(
     "fields,expected",
     (
-        ([], {"field3": "three", "sub": {"subfield2": "sub2"}}),
+        ([], _NESTED_IN_DEFAULT_ONLY),
         (
             ["field1"],
             {"field1": "one", "field3": "three", "sub": {"subfield2": "sub2"}},
         ),
-        (["sub"], {"field3": "three", "sub": {"subfield2": "sub2"}}),
+        (["sub"], _NESTED_IN_DEFAULT_ONLY),
         (
             ["sub.subfield1"],
             {"field3": "three", "sub": {"subfield1": "sub1", "subfield2": "sub2"}},
         ),
     ),
+    ids=["no_fields", "field1", "sub", "sub.subfield1"],
 )
-def test_nested_by_field_in_default(fields: List[str], expected: dict) -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
-
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["subfield2"]})
+def test_nested_by_field_in_default(
+    nested_in_default_response: NestedInDefaultResponseModel,
+    fields: List[str],
+    expected: dict,
+) -> None:
+    assert_expected_rendered_fieldset_data(nested_in_default_response, fields, expected)
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: SubModel
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"default": ["field3", "sub"]}
-        )
+class NestedNamedSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
 
-    response = ResponseModel(
-        field1="one",
-        field2="two",
-        field3="three",
-        sub=SubModel(
-            subfield1="sub1",
-            subfield2="sub2",
-        ),
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "subfset1": ["subfield2"],
+            "subfset2": ["subfield1", "subfield2"],
+        }
     )
 
-    assert_expected_rendered_fieldset_data(response, fields, expected)
 
+class NestedNamedResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: NestedNamedSubModel
 
-def test_nested_named_fieldset_and_named_field() -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "subfset1": ["subfield2"],
-                "subfset2": ["subfield1", "subfield2"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field3"],
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: SubModel
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field3"],
-            }
-        )
-
-    response = ResponseModel(
+def test_nested_named_fieldset_and_named_field() -> None:
+    response = NestedNamedResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
-        sub=SubModel(
+        sub=NestedNamedSubModel.model_construct(
             subfield1="sub1",
             subfield2="sub2",
         ),
@@ -484,40 +571,42 @@ def test_nested_named_fieldset_and_named_field() -> None:
     )
 
 
-def test_nested_named_fieldset_sublist() -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
+class NestedSublistSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "subfset1": ["subfield2"],
-                "subfset2": ["subfield1", "subfield2"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "subfset1": ["subfield2"],
+            "subfset2": ["subfield1", "subfield2"],
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: List[SubModel]
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field3"],
-            }
-        )
+class NestedSublistResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: List[NestedSublistSubModel]
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field3"],
+        }
+    )
 
-    response = ResponseModel(
+
+def test_nested_named_fieldset_sublist() -> None:
+    response = NestedSublistResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
         sub=[
-            SubModel(
+            NestedSublistSubModel.model_construct(
                 subfield1="sub1",
                 subfield2="sub2",
             ),
-            SubModel(
+            NestedSublistSubModel.model_construct(
                 subfield1="sub3",
                 subfield2="sub4",
             ),
@@ -531,39 +620,41 @@ def test_nested_named_fieldset_sublist() -> None:
     )
 
 
-def test_nested_model_with_default() -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
+class NestedDefaultSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["subfield2"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["subfield2"],
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: List[SubModel]
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field3"],
-            }
-        )
+class NestedDefaultResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: List[NestedDefaultSubModel]
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field3"],
+        }
+    )
+
 
-    response = ResponseModel(
+def test_nested_model_with_default() -> None:
+    response = NestedDefaultResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
         sub=[
-            SubModel(
+            NestedDefaultSubModel.model_construct(
                 subfield1="sub1",
                 subfield2="sub2",
             ),
-            SubModel(
+            NestedDefaultSubModel.model_construct(
                 subfield1="sub3",
                 subfield2="sub4",
             ),
@@ -577,39 +668,41 @@ def test_nested_model_with_default() -> None:
     )
 
 
-def test_nested_model_with_default_at_all_levels() -> None:
-    class SubModel(BaseModel):
-        subfield1: str
-        subfield2: str
+class AllLevelsSubModel(BaseModel):
+    subfield1: str
+    subfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["subfield2"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["subfield2"],
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
-        sub: List[SubModel]
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field3", "sub"],
-            }
-        )
+class AllLevelsResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+    sub: List[AllLevelsSubModel]
 
-    response = ResponseModel(
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field3", "sub"],
+        }
+    )
+
+
+def test_nested_model_with_default_at_all_levels() -> None:
+    response = AllLevelsResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
         sub=[
-            SubModel(
+            AllLevelsSubModel.model_construct(
                 subfield1="sub1",
                 subfield2="sub2",
             ),
-            SubModel(
+            AllLevelsSubModel.model_construct(
                 subfield1="sub3",
                 subfield2="sub4",
             ),
@@ -623,28 +716,31 @@ def test_nested_model_with_default_at_all_levels() -> None:
     )
 
 
-def test_nested_optional_model_not_given() -> None:
-    class QueryModel(BaseModel):
-        what: str
+class OptionalNotGivenQueryModel(BaseModel):
+    what: str
+
 
-    class ResponseModel(BaseModel):
-        items: List[str]
-        query: Optional[QueryModel] = None
+class OptionalNotGivenResponseModel(BaseModel):
+    items: List[str]
+    query: Optional[OptionalNotGivenQueryModel] = None
 
-    response = ResponseModel(items=[])
+
+def test_nested_optional_model_not_given() -> None:
+    response = OptionalNotGivenResponseModel.model_construct(items=[])
 
     assert_expected_rendered_fieldset_data(response, [], {"items": [], "query": None})
 
 
-def test_default_start() -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+class StarDefaultResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["*"]})
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["*"]})
 
-    response = ResponseModel(
+def test_default_start() -> None:
+    response = StarDefaultResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
@@ -655,15 +751,16 @@ def test_default_start() -> None:
     )
 
 
-def test_fieldsets_as_string() -> None:
-    class ResponseModel(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+class AsStringResponseModel(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
 
-    response = ResponseModel(
+def test_fieldsets_as_string() -> None:
+    response = AsStringResponseModel.model_construct(
         field1="one",
         field2="two",
         field3="three",
@@ -674,24 +771,26 @@ def test_fieldsets_as_string() -> None:
     )
 
 
-def test_fieldset_that_references_itself() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
+class SelfRefThing(BaseModel):
+    field1: str
+    field2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+            "field2": ["field2"],
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field1"],
-                "field2": ["field2"],
-            }
-        )
 
-    class ResponseModel(BaseModel):
-        things: List[Thing]
+class SelfRefResponseModel(BaseModel):
+    things: List[SelfRefThing]
 
-    response = ResponseModel(
+
+def test_fieldset_that_references_itself() -> None:
+    response = SelfRefResponseModel.model_construct(
         things=[
-            Thing(
+            SelfRefThing.model_construct(
                 field1="one",
                 field2="two",
             )
@@ -705,24 +804,26 @@ def test_fieldset_that_references_itself() -> None:
     )
 
 
-def test_fieldset_that_references_itself_but_does_not_exist_as_a_field() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
+class SelfRefMissingThing(BaseModel):
+    field1: str
+    field2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field1"],
-                "does_not_exist": ["does_not_exist", "field2"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+            "does_not_exist": ["does_not_exist", "field2"],
+        }
+    )
 
-    class ResponseModel(BaseModel):
-        things: List[Thing]
 
-    response = ResponseModel(
+class SelfRefMissingResponseModel(BaseModel):
+    things: List[SelfRefMissingThing]
+
+
+def test_fieldset_that_references_itself_but_does_not_exist_as_a_field() -> None:
+    response = SelfRefMissingResponseModel.model_construct(
         things=[
-            Thing(
+            SelfRefMissingThing.model_construct(
                 field1="one",
                 field2="two",
             )
@@ -736,93 +837,93 @@ def test_fieldset_that_references_itself_but_does_not_exist_as_a_field() -> None
     )
 
 
-def test_fieldsets_dict() -> None:
-    class Thing(BaseModel):
-        str1: str
-        str2: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["str1"],
-            }
-        )
-
-    class Container(BaseModel):
-        things: Dict[str, Thing]
+class DictThing(BaseModel):
+    str1: str
+    str2: str
 
-    container = Container(
-        things={
-            "cat1": Thing(str1="c1t1str1val", str2="c1t1str2val"),
-            "cat2": Thing(str1="c2t1str1val", str2="c2t1str2val"),
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["str1"],
         }
     )
 
-    assert_expected_rendered_fieldset_data(
-        container,
-        "things.str1",
-        {
-            "things": {
-                "cat1": {"str1": "c1t1str1val"},
-                "cat2": {"str1": "c2t1str1val"},
-            }
-        },
-    )
 
+class DictContainer(BaseModel):
+    things: Dict[str, DictThing]
 
-def test_fieldsets_dict_non_model_value() -> None:
-    class Container(BaseModel):
-        things: Dict[str, str]
 
-    container = Container(
-        things={
-            "cat1": "boo",
-            "cat2": "lal",
-        }
-    )
+class DictNonModelContainer(BaseModel):
+    things: Dict[str, str]
 
-    assert_expected_rendered_fieldset_data(
-        container,
-        "things.str1",
-        {
-            "things": {
-                "cat1": "boo",
-                "cat2": "lal",
-            }
-        },
-    )
 
+class DictListContainer(BaseModel):
+    things: Dict[str, List[DictThing]]
 
-def test_fieldsets_dict_list() -> None:
-    class Thing(BaseModel):
-        str1: str
-        str2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["str1"],
-            }
-        )
+class DictListNonModelContainer(BaseModel):
+    things: Dict[str, List[str]]
 
-    class Container(BaseModel):
-        things: Dict[str, List[Thing]]
 
-    container = Container(
-        things={
-            "cat1": [
-                Thing(str1="c1t1str1val", str2="c1t1str2val"),
-                Thing(str1="c1t2str1val", str2="c1t2str2val"),
-            ],
-            "cat2": [
-                Thing(str1="c2t1str1val", str2="c2t1str2val"),
-            ],
-        }
-    )
+class DictDictContainer(BaseModel):
+    things: Dict[str, Dict[str, DictThing]]
 
-    assert_expected_rendered_fieldset_data(
-        container,
-        "things.str1",
-        {
-            "things": {
+
+class DictListDictContainer(BaseModel):
+    things: Dict[str, List[Dict[str, DictThing]]]
+
+
+@pytest.mark.parametrize(
+    "container,expected_things",
+    (
+        pytest.param(
+            DictContainer.model_construct(
+                things={
+                    "cat1": DictThing.model_construct(
+                        str1="c1t1str1val", str2="c1t1str2val"
+                    ),
+                    "cat2": DictThing.model_construct(
+                        str1="c2t1str1val", str2="c2t1str2val"
+                    ),
+                }
+            ),
+            {
+                "cat1": {"str1": "c1t1str1val"},
+                "cat2": {"str1": "c2t1str1val"},
+            },
+            id="dict",
+        ),
+        pytest.param(
+            DictNonModelContainer.model_construct(
+                things={
+                    "cat1": "boo",
+                    "cat2": "lal",
+                }
+            ),
+            {
+                "cat1": "boo",
+                "cat2": "lal",
+            },
+            id="dict_non_model_value",
+        ),
+        pytest.param(
+            DictListContainer.model_construct(
+                things={
+                    "cat1": [
+                        DictThing.model_construct(
+                            str1="c1t1str1val", str2="c1t1str2val"
+                        ),
+                        DictThing.model_construct(
+                            str1="c1t2str1val", str2="c1t2str2val"
+                        ),
+                    ],
+                    "cat2": [
+                        DictThing.model_construct(
+                            str1="c2t1str1val", str2="c2t1str2val"
+                        ),
+                    ],
+                }
+            ),
+            {
                 "cat1": [
                     {"str1": "c1t1str1val"},
                     {"str1": "c1t2str1val"},
@@ -830,124 +931,397 @@ def test_fieldsets_dict_list() -> None:
                 "cat2": [
                     {"str1": "c2t1str1val"},
                 ],
-            }
-        },
+            },
+            id="dict_list",
+        ),
+        pytest.param(
+            DictListNonModelContainer.model_construct(
+                things={
+                    "cat1": ["boo", "bar", "baz"],
+                    "cat2": ["lal", "whatever"],
+                }
+            ),
+            {
+                "cat1": ["boo", "bar", "baz"],
+                "cat2": ["lal", "whatever"],
+            },
+            id="dict_list_non_model_value",
+        ),
+        pytest.param(
+            DictDictContainer.model_construct(
+                things={
+                    "cat1": {
+                        "nest1": DictThing.model_construct(
+                            str1="c1t1str1val", str2="c1t1str2val"
+                        )
+                    },
+                    "cat2": {
+                        "nest2": DictThing.model_construct(
+                            str1="c2t1str1val", str2="c2t1str2val"
+                        )
+                    },
+                }
+            ),
+            {
+                "cat1": {"nest1": {"str1": "c1t1str1val"}},
+                "cat2": {"nest2": {"str1": "c2t1str1val"}},
+            },
+            id="dict_dict",
+        ),
+        pytest.param(
+            DictListDictContainer.model_construct(
+                things={
+                    "cat1": [
+                        {
+                            "nest1": DictThing.model_construct(
+                                str1="c1t1str1val", str2="c1t1str2val"
+                            )
+                        },
+                        {
+                            "nest2": DictThing.model_construct(
+                                str1="c1t2str1val", str2="c1t2str2val"
+                            )
+                        },
+                    ],
+                    "cat2": [
+                        {
+                            "nest3": DictThing.model_construct(
+                                str1="c3t1str1val", str2="c3t1str2val"
+                            )
+                        },
+                    ],
+                }
+            ),
+            {
+                "cat1": [
+                    {"nest1": {"str1": "c1t1str1val"}},
+                    {"nest2": {"str1": "c1t2str1val"}},
+                ],
+                "cat2": [
+                    {"nest3": {"str1": "c3t1str1val"}},
+                ],
+            },
+            id="dict_list_dict",
+        ),
+    ),
+)
+def test_fieldsets_dict(container: BaseModel, expected_things: dict) -> None:
+    assert_expected_rendered_fieldset_data(
+        container, "things.str1", {"things": expected_things}
     )
 
 
-def test_fieldsets_dict_list_non_model_value() -> None:
-    class Container(BaseModel):
-        things: Dict[str, List[str]]
+class OptionalDictThing(BaseModel):
+    str1: str
+    data: Optional[Dict[str, Any]] = None
 
-    container = Container(
-        things={
-            "cat1": ["boo", "bar", "baz"],
-            "cat2": ["lal", "whatever"],
-        }
-    )
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["*"]})
+
+
+def test_optional_dict_none() -> None:
+    thing = OptionalDictThing.model_construct(str1="foo")
 
     assert_expected_rendered_fieldset_data(
-        container,
-        "things.str1",
+        thing,
+        "",
         {
-            "things": {
-                "cat1": ["boo", "bar", "baz"],
-                "cat2": ["lal", "whatever"],
-            }
+            "str1": "foo",
+            "data": None,
         },
     )
 
 
-def test_fieldsets_dict_dict() -> None:
-    class Thing(BaseModel):
-        str1: str
-        str2: str
+class RendersAllNoConfig(BaseModel):
+    field1: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["str1"],
-            }
-        )
 
-    class Container(BaseModel):
-        things: Dict[str, Dict[str, Thing]]
+class RendersAllStarDefault(BaseModel):
+    field1: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["*"]})
+
+
+class RendersAllWithDefault(BaseModel):
+    field1: str
+    field2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
+
+
+class RendersAllWithComputed(BaseModel):
+    field1: str
+
+    @computed_field  # type: ignore[misc]
+    @property
+    def field2(self) -> str:
+        return self.field1
+
+
+class RendersAllNestedNoConfig(BaseModel):
+    sub: RendersAllNoConfig
+    subs: List[RendersAllStarDefault]
+    subdict: Dict[str, Optional[RendersAllNoConfig]]
+
 
-    container = Container(
-        things={
-            "cat1": {"nest1": Thing(str1="c1t1str1val", str2="c1t1str2val")},
-            "cat2": {"nest2": Thing(str1="c2t1str1val", str2="c2t1str2val")},
+class RendersAllNestedWithDefault(BaseModel):
+    subs: Dict[str, List[RendersAllWithDefault]]
+
+
+class RendersAllNestedAny(BaseModel):
+    sub: Any
+
+
+class RendersAllBareDict(BaseModel):
+    sub: dict
+
+
+class RendersAllBareList(BaseModel):
+    sub: list
+
+
+class RendersAllTypingList(BaseModel):
+    sub: List
+
+
+class RendersAllBase(BaseModel):
+    field1: str
+    field2: str
+
+
+class RendersAllDerived(RendersAllBase):
+    def get_expanded(self, context: Any) -> str:
+        return "expanded"
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+            "expanded": ModelExpansion(expansion_method_name="get_expanded"),
         }
     )
 
+
+class RendersAllPolymorphic(BaseModel):
+    sub: RendersAllBase
+
+
+@dataclass
+class RendersAllDataclass:
+    item: RendersAllWithDefault
+
+
+class RendersAllDataclassField(BaseModel):
+    sub: RendersAllDataclass
+
+
+_RENDERS_ALL_SUB = RendersAllDerived(field1="foo", field2="bar")
+_RENDERS_ALL_WITH_DEFAULT = RendersAllWithDefault(field1="foo", field2="bar")
+
+
+@pytest.mark.parametrize(
+    "model,expected",
+    [
+        pytest.param(RendersAllNoConfig(field1="foo"), True, id="no_config"),
+        pytest.param(RendersAllStarDefault(field1="foo"), True, id="star_default"),
+        pytest.param(
+            RendersAllNestedNoConfig(
+                sub=RendersAllNoConfig(field1="foo"),
+                subs=[RendersAllStarDefault(field1="foo")],
+                subdict={"key": None},
+            ),
+            True,
+            id="nested_no_config",
+        ),
+        pytest.param(_RENDERS_ALL_WITH_DEFAULT, False, id="with_default"),
+        pytest.param(RendersAllWithComputed(field1="foo"), False, id="computed"),
+        pytest.param(
+            RendersAllNestedWithDefault(subs={"key": [_RENDERS_ALL_WITH_DEFAULT]}),
+            False,
+            id="nested_with_default",
+        ),
+        pytest.param(RendersAllNestedAny(sub="foo"), True, id="any_scalar"),
+        pytest.param(
+            RendersAllNestedAny(sub=_RENDERS_ALL_WITH_DEFAULT), False, id="any_model"
+        ),
+        pytest.param(RendersAllBareDict(sub={"key": 1}), True, id="bare_dict_scalar"),
+        pytest.param(
+            RendersAllBareDict(sub={"key": _RENDERS_ALL_SUB}), False, id="bare_dict"
+        ),
+        pytest.param(RendersAllBareList(sub=[_RENDERS_ALL_SUB]), False, id="bare_list"),
+        pytest.param(
+            RendersAllTypingList(sub=[_RENDERS_ALL_SUB]), False, id="typing_list"
+        ),
+        pytest.param(
+            RendersAllPolymorphic(sub=RendersAllBase(field1="foo", field2="bar")),
+            True,
+            id="base_class",
+        ),
+        pytest.param(RendersAllPolymorphic(sub=_RENDERS_ALL_SUB), False, id="subclass"),
+        pytest.param(
+            RendersAllDataclassField(
+                sub=RendersAllDataclass(item=_RENDERS_ALL_WITH_DEFAULT)
+            ),
+            False,
+            id="dataclass",
+        ),
+    ],
+)
+def test_model_renders_all_fields(model: BaseModel, expected: bool) -> None:
+    assert model_renders_all_fields(model) is expected
+
+
+@pytest.mark.parametrize(
+    "model,fields,expected",
+    [
+        pytest.param(
+            RendersAllBareDict(sub={"key": _RENDERS_ALL_SUB}),
+            ["sub.expanded"],
+            {"sub": {"key": {"field1": "foo", "expanded": "expanded"}}},
+            id="bare_dict",
+        ),
+        pytest.param(
+            RendersAllBareList(sub=[_RENDERS_ALL_SUB]),
+            ["sub.expanded"],
+            {"sub": [{"field1": "foo", "expanded": "expanded"}]},
+            id="bare_list",
+        ),
+        pytest.param(
+            RendersAllTypingList(sub=[_RENDERS_ALL_SUB]),
+            ["sub.expanded"],
+            {"sub": [{"field1": "foo", "expanded": "expanded"}]},
+            id="typing_list",
+        ),
+        pytest.param(
+            RendersAllPolymorphic(sub=_RENDERS_ALL_SUB),
+            ["sub.expanded"],
+            {"sub": {"field1": "foo", "expanded": "expanded"}},
+            id="subclass",
+        ),
+    ],
+)
+def test_configured_models_in_loosely_annotated_fields(
+    model: BaseModel, fields: List[str], expected: dict
+) -> None:
+    assert_expected_rendered_fieldset_data(model, fields, expected)
+
+
+def test_configured_model_in_dataclass_field_is_filtered() -> None:
+    # the include builder does not descend into dataclasses, so nothing of the
+    # configured model is rendered rather than all of its fields
     assert_expected_rendered_fieldset_data(
-        container,
-        "things.str1",
-        {
-            "things": {
-                "cat1": {"nest1": {"str1": "c1t1str1val"}},
-                "cat2": {"nest2": {"str1": "c2t1str1val"}},
-            }
-        },
+        RendersAllDataclassField(
+            sub=RendersAllDataclass(item=_RENDERS_ALL_WITH_DEFAULT)
+        ),
+        [],
+        {"sub": {}},
     )
 
 
-def test_fieldsets_dict_list_dict() -> None:
-    class Thing(BaseModel):
-        str1: str
-        str2: str
+class LateSubclassBase(BaseModel):
+    field1: str
+
+
+class LateSubclassResponse(BaseModel):
+    item: LateSubclassBase
+
+
+def test_subclass_defined_after_first_render() -> None:
+    assert_expected_rendered_fieldset_data(
+        LateSubclassResponse(item=LateSubclassBase(field1="foo")),
+        ["item.expanded"],
+        {"item": {"field1": "foo"}},
+    )
+
+    # defined here on purpose: after the response model was first rendered
+    class LateSubclass(LateSubclassBase):
+        field2: str = "bar"
+
+        def get_expanded(self, context: Any) -> str:
+            return "expanded"
 
         fieldset_config: ClassVar = FieldsetConfig(
             fieldsets={
-                "default": ["str1"],
+                "default": ["field2"],
+                "expanded": ModelExpansion(expansion_method_name="get_expanded"),
             }
         )
 
-    class Container(BaseModel):
-        things: Dict[str, List[Dict[str, Thing]]]
-
-    container = Container(
-        things={
-            "cat1": [
-                {"nest1": Thing(str1="c1t1str1val", str2="c1t1str2val")},
-                {"nest2": Thing(str1="c1t2str1val", str2="c1t2str2val")},
-            ],
-            "cat2": [
-                {"nest3": Thing(str1="c3t1str1val", str2="c3t1str2val")},
-            ],
-        }
-    )
-
+    # serialized as the annotated base class, so only its fields plus the
+    # subclass's expansion
     assert_expected_rendered_fieldset_data(
-        container,
-        "things.str1",
-        {
-            "things": {
-                "cat1": [
-                    {"nest1": {"str1": "c1t1str1val"}},
-                    {"nest2": {"str1": "c1t2str1val"}},
-                ],
-                "cat2": [
-                    {"nest3": {"str1": "c3t1str1val"}},
-                ],
-            }
-        },
+        LateSubclassResponse(item=LateSubclass(field1="foo")),
+        ["item.expanded"],
+        {"item": {"expanded": "expanded"}},
     )
 
 
-def test_optional_dict_none() -> None:
-    class Thing(BaseModel):
-        str1: str
-        data: Optional[Dict[str, Any]] = None
+def test_model_default_fields() -> None:
+    assert model_default_fields(RendersAllNoConfig) == {"field1"}
+    assert model_default_fields(StarDefaultResponseModel) == {
+        "field1",
+        "field2",
+        "field3",
+    }
+    assert model_default_fields(SingleSubsetDefaultResponseModel) == {"field3"}
+    assert model_default_fields(SingleAnyConfigResponseModel) == set()
+
+
+def test_fields_request_set_not_modified(
+    single_subset_default_response: SingleSubsetDefaultResponseModel,
+) -> None:
+    fields_request = {"field1"}
+
+    includes, _ = fieldset_to_includes(fields_request, single_subset_default_response)
+
+    assert set(includes) == {"field1", "field3"}
+    assert fields_request == {"field1"}
+
+
+class WholeItem(BaseModel):
+    item1: str
+    item2: str
+
+
+class WholeResponseModel(BaseModel):
+    field1: str
+    items: List[WholeItem]
+    by_key: Dict[str, WholeItem]
+    tags: List[str]
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
 
-        fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["*"]})
 
-    thing = Thing(str1="foo")
+def test_unconfigured_field_values_included_whole() -> None:
+    response = WholeResponseModel.model_construct(
+        field1="one",
+        items=[
+            WholeItem.model_construct(item1="a", item2="b"),
+            WholeItem.model_construct(item1="c", item2="d"),
+        ],
+        by_key={"k": WholeItem.model_construct(item1="e", item2="f")},
+        tags=["t1", "t2"],
+    )
+
+    includes, _ = fieldset_to_includes(["items.item1", "by_key", "tags"], response)
+    assert includes == {"field1": True, "items": True, "by_key": True, "tags": True}
 
     assert_expected_rendered_fieldset_data(
-        thing,
-        "",
+        response,
+        ["items.item1", "by_key", "tags"],
         {
-            "str1": "foo",
-            "data": None,
+            "field1": "one",
+            "items": [{"item1": "a", "item2": "b"}, {"item1": "c", "item2": "d"}],
+            "by_key": {"k": {"item1": "e", "item2": "f"}},
+            "tags": ["t1", "t2"],
         },
     )
+
+
+def test_model_named_fieldsets() -> None:
+    assert model_named_fieldsets(SelfRefThing) == {
+        "default": ["field1"],
+        "field2": ["field2"],
+    }
+    assert model_named_fieldsets(SelfRefMissingThing) == {
+        "default": ["field1"],
+        "does_not_exist": ["field2"],
+    }
@@ -1,313 +1,316 @@
-from typing import ClassVar, List, Optional
+from typing import Any, Awaitable, ClassVar, Dict, List, Optional, Type
 
-from pydantic import BaseModel
+import pytest
+from pydantic import BaseModel, Field
 
 from pydantic_enhanced_serializer import (
     FieldsetConfig,
     FieldsetGenerateJsonSchema,
     ModelExpansion,
 )
+from pydantic_enhanced_serializer.schema import model_has_fieldsets_defined
 
 
-def test_fields_in_fieldset() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+class InFieldsetThing(BaseModel):
+    field1: str
+    field2: str
+    field3: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "extra": ["field1", "field2"],
-                "extra2": ["field2", "field3"],
-            }
-        )
-
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
-    assert schema
-    assert schema["properties"]
-
-    assert (
-        schema["properties"]["field1"]["description"]
-        == "Request by name or using fieldset(s): `extra`."
-    )
-    assert (
-        schema["properties"]["field2"]["description"]
-        == "Request by name or using fieldset(s): `extra`, `extra2`."
-    )
-    assert (
-        schema["properties"]["field3"]["description"]
-        == "Request by name or using fieldset(s): `extra2`."
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "extra": ["field1", "field2"],
+            "extra2": ["field2", "field3"],
+        }
     )
 
 
-def test_fields_in_default() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+class InDefaultThing(BaseModel):
+    field1: str
+    field2: str
+    field3: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field1", "field2"],
-                "extra": ["field2", "field3"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1", "field2"],
+            "extra": ["field2", "field3"],
+        }
+    )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
-    assert schema
-    assert schema["properties"]
 
-    assert "description" not in schema["properties"]["field1"]
-    assert "description" not in schema["properties"]["field2"]
-    assert (
-        schema["properties"]["field3"]["description"]
-        == "Request by name or using fieldset(s): `extra`."
+class StarDefaultThing(BaseModel):
+    field1: str
+    field2: str
+    field3: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["*"],
+        }
     )
 
 
-def test_fields_star_default() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+class NamedDefaultThing(BaseModel):
+    field1: str
+    field2: str
+    field3: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["*"],
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={"default": ["field1", "field2", "field3"]}
+    )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+
+_EXTRA = "Request by name or using fieldset(s): `extra`."
+
+
+@pytest.mark.parametrize(
+    "model,expected_descriptions",
+    [
+        pytest.param(
+            InFieldsetThing,
+            {
+                "field1": _EXTRA,
+                "field2": "Request by name or using fieldset(s): `extra`, `extra2`.",
+                "field3": "Request by name or using fieldset(s): `extra2`.",
+            },
+            id="in_fieldset",
+        ),
+        pytest.param(
+            InDefaultThing,
+            {"field1": None, "field2": None, "field3": _EXTRA},
+            id="in_default",
+        ),
+        pytest.param(
+            StarDefaultThing,
+            {"field1": None, "field2": None, "field3": None},
+            id="star_default",
+        ),
+        pytest.param(
+            NamedDefaultThing,
+            {"field1": None, "field2": None, "field3": None},
+            id="named_default",
+        ),
+    ],
+)
+def test_field_descriptions(
+    model: Type[BaseModel], expected_descriptions: Dict[str, Optional[str]]
+) -> None:
+    schema = model.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
     assert schema
     assert schema["properties"]
 
-    assert "description" not in schema["properties"]["field1"]
-    assert "description" not in schema["properties"]["field2"]
-    assert "description" not in schema["properties"]["field3"]
+    for field, description in expected_descriptions.items():
+        assert schema["properties"][field].get("description") == description
 
 
-def test_fields_named_default() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
-        field3: str
+class SubObjectSubThing(BaseModel):
+    sfield1: str
+    sfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"default": ["field1", "field2", "field3"]}
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "f1": ["sfield1"],
+            "f2": ["sfield1", "sfield2"],
+        }
+    )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
-    assert schema
-    assert schema["properties"]
 
-    assert "description" not in schema["properties"]["field1"]
-    assert "description" not in schema["properties"]["field2"]
-    assert "description" not in schema["properties"]["field3"]
+class SubObjectThing(BaseModel):
+    field1: str
+    field2: SubObjectSubThing
 
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={"default": ["field1", "field2"]}
+    )
+
+
+class SubObjectListSubThing(BaseModel):
+    sfield1: str
+    sfield2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "f1": ["sfield1"],
+            "f2": ["sfield1", "sfield2"],
+        }
+    )
 
-def test_sub_object() -> None:
-    class SubThing(BaseModel):
-        sfield1: str
-        sfield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "f1": ["sfield1"],
-                "f2": ["sfield1", "sfield2"],
-            }
-        )
+class SubObjectListThing(BaseModel):
+    field1: str
+    field2: List[SubObjectListSubThing]
 
-    class Thing(BaseModel):
-        field1: str
-        field2: SubThing
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={"default": ["field1", "field2"]}
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"default": ["field1", "field2"]}
-        )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+@pytest.mark.parametrize(
+    "model,sub_model",
+    [
+        pytest.param(SubObjectThing, SubObjectSubThing, id="single"),
+        pytest.param(SubObjectListThing, SubObjectListSubThing, id="list"),
+    ],
+)
+def test_sub_object(model: Type[BaseModel], sub_model: Type[BaseModel]) -> None:
+    schema = model.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
     assert schema
     assert schema["properties"]
 
     assert "description" not in schema["properties"]["field1"]
     assert "description" not in schema["properties"]["field2"]
 
-    assert "SubThing" in schema["$defs"]
+    sub_name = sub_model.__name__
+    assert sub_name in schema["$defs"]
     assert (
-        schema["$defs"]["SubThing"]["properties"]["sfield1"]["description"]
+        schema["$defs"][sub_name]["properties"]["sfield1"]["description"]
         == "Request by name or using fieldset(s): `f1`, `f2`."
     )
     assert (
-        schema["$defs"]["SubThing"]["properties"]["sfield2"]["description"]
+        schema["$defs"][sub_name]["properties"]["sfield2"]["description"]
         == "Request by name or using fieldset(s): `f2`."
     )
 
 
-def test_sub_object_list() -> None:
-    class SubThing(BaseModel):
-        sfield1: str
-        sfield2: str
+_EXPANDO = "Request by name or using fieldset(s): `expando`."
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "f1": ["sfield1"],
-                "f2": ["sfield1", "sfield2"],
-            }
-        )
 
-    class Thing(BaseModel):
-        field1: str
-        field2: List[SubThing]
+class ExpansionModelExpandedThing(BaseModel):
+    efield1: str
+    efield2: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={"default": ["field1", "field2"]}
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "f1": ["efield1", "efield2"],
+            "f2": ["efield2"],
+        }
+    )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
-    assert schema
-    assert schema["properties"]
 
-    assert "description" not in schema["properties"]["field1"]
-    assert "description" not in schema["properties"]["field2"]
+class ExpansionModelThing(BaseModel):
+    field1: str
+    boo: ExpansionModelExpandedThing = Field(description="yo!")
 
-    assert "SubThing" in schema["$defs"]
-    assert (
-        schema["$defs"]["SubThing"]["properties"]["sfield1"]["description"]
-        == "Request by name or using fieldset(s): `f1`, `f2`."
-    )
-    assert (
-        schema["$defs"]["SubThing"]["properties"]["sfield2"]["description"]
-        == "Request by name or using fieldset(s): `f2`."
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando": ModelExpansion(
+                expansion_method_name="foo",
+                response_model=ExpansionModelExpandedThing,
+            )
+        }
     )
 
 
 def test_expansion_model() -> None:
-    class ExpandedThing(BaseModel):
-        efield1: str
-        efield2: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "f1": ["efield1", "efield2"],
-                "f2": ["efield2"],
-            }
-        )
-
-    from pydantic import Field
-
-    class Thing(BaseModel):
-        field1: str
-        boo: ExpandedThing = Field(description="yo!")
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "expando": ModelExpansion(
-                    expansion_method_name="foo",
-                    response_model=ExpandedThing,
-                )
-            }
-        )
-
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+    schema = ExpansionModelThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
     assert schema
     assert schema["properties"]
     assert schema["$defs"]
-    assert "ExpandedThing" in schema["$defs"]
-    assert "properties" in schema["$defs"]["ExpandedThing"]
+    assert "ExpansionModelExpandedThing" in schema["$defs"]
+    assert "properties" in schema["$defs"]["ExpansionModelExpandedThing"]
 
     assert "expando" in schema["properties"]
     assert schema["properties"]["expando"] == {
-        "title": "ExpandedThing",
-        "description": "Request by name or using fieldset(s): `expando`.",
-        "$ref": "#/$defs/ExpandedThing",
+        "title": "ExpansionModelExpandedThing",
+        "description": _EXPANDO,
+        "$ref": "#/$defs/ExpansionModelExpandedThing",
     }
 
 
+class ExpansionModelListExpandedThing(BaseModel):
+    efield1: str
+    efield2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "f1": ["efield1", "efield2"],
+            "f2": ["efield2"],
+        }
+    )
+
+
+class ExpansionModelListThing(BaseModel):
+    field1: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando": ModelExpansion(
+                expansion_method_name="foo",
+                response_model=List[ExpansionModelListExpandedThing],
+            )
+        }
+    )
+
+
 def test_expansion_model_list() -> None:
-    class ExpandedThing(BaseModel):
-        efield1: str
-        efield2: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "f1": ["efield1", "efield2"],
-                "f2": ["efield2"],
-            }
-        )
-
-    class Thing(BaseModel):
-        field1: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "expando": ModelExpansion(
-                    expansion_method_name="foo",
-                    response_model=List[ExpandedThing],
-                )
-            }
-        )
-
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+    schema = ExpansionModelListThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
     assert schema
     assert schema["properties"]
 
     assert "expando" in schema["properties"]
     assert schema["properties"]["expando"] == {
-        "title": "ExpandedThing",
-        "description": "Request by name or using fieldset(s): `expando`.",
+        "title": "ExpansionModelListExpandedThing",
+        "description": _EXPANDO,
         "type": "array",
         "items": {
-            "$ref": "#/$defs/ExpandedThing",
+            "$ref": "#/$defs/ExpansionModelListExpandedThing",
         },
     }
 
 
+class ScalarThing(BaseModel):
+    field1: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando": ModelExpansion(
+                expansion_method_name="foo",
+                response_model=int,
+            )
+        }
+    )
+
+
 def test_expansion_scalar() -> None:
-    class Thing(BaseModel):
-        field1: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "expando": ModelExpansion(
-                    expansion_method_name="foo",
-                    response_model=int,
-                )
-            }
-        )
-
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+    schema = ScalarThing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
     assert schema
     assert schema["properties"]
 
     assert "expando" in schema["properties"]
     assert schema["properties"]["expando"] == {
         "title": "expando",
-        "description": "Request by name or using fieldset(s): `expando`.",
+        "description": _EXPANDO,
         "type": "integer",
     }
 
 
+class ScalarListThing(BaseModel):
+    field1: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando": ModelExpansion(
+                expansion_method_name="foo",
+                response_model=List[int],
+            )
+        }
+    )
+
+
 def test_expansion_scalar_list() -> None:
-    class Thing(BaseModel):
-        field1: str
-
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "expando": ModelExpansion(
-                    expansion_method_name="foo",
-                    response_model=List[int],
-                )
-            }
-        )
-
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+    schema = ScalarListThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
     assert schema
     assert schema["properties"]
 
     assert "expando" in schema["properties"]
     assert schema["properties"]["expando"] == {
         "title": "expando",
-        "description": "Request by name or using fieldset(s): `expando`.",
+        "description": _EXPANDO,
         "type": "array",
         "items": {
             "type": "integer",
@@ -315,46 +318,165 @@ def test_expansion_scalar_list() -> None:
     }
 
 
-def test_optional_expansion_response_model() -> None:
-    class Expanded(BaseModel):
-        efield1: str
+class OptionalExpansionExpanded(BaseModel):
+    efield1: str
+
 
-    class Thing(BaseModel):
-        field1: str
+class OptionalExpansionThing(BaseModel):
+    field1: str
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "expando": ModelExpansion(
-                    expansion_method_name="foo", response_model=Optional[Expanded]
-                )
-            }
-        )
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando": ModelExpansion(
+                expansion_method_name="foo",
+                response_model=Optional[OptionalExpansionExpanded],
+            )
+        }
+    )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+
+def test_optional_expansion_response_model() -> None:
+    schema = OptionalExpansionThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
 
     assert schema
     assert schema["properties"]
 
     assert "expando" in schema["properties"]
     assert schema["properties"]["expando"] == {
-        "title": "Expanded",
+        "title": "OptionalExpansionExpanded",
+        "description": _EXPANDO,
+        "anyOf": [{"$ref": "#/$defs/OptionalExpansionExpanded"}, {"type": "null"}],
+    }
+
+
+class FromAnnotationExpanded(BaseModel):
+    efield1: str
+
+
+async def _get_expanded() -> FromAnnotationExpanded:
+    return FromAnnotationExpanded(efield1="efield1")
+
+
+class FromAnnotationThing(BaseModel):
+    field1: str
+
+    def get_list(self, context: Any) -> List[FromAnnotationExpanded]:
+        return []
+
+    def get_optional_list(self, context: Any) -> Optional[List[FromAnnotationExpanded]]:
+        return None
+
+    def get_dict(self, context: Any) -> Dict[str, FromAnnotationExpanded]:
+        return {}
+
+    def get_awaitable(self, context: Any) -> Awaitable[FromAnnotationExpanded]:
+        return _get_expanded()
+
+    def get_scalar(self, context: Any) -> int:
+        return 1
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando_list": ModelExpansion(expansion_method_name="get_list"),
+            "expando_optional_list": ModelExpansion(
+                expansion_method_name="get_optional_list"
+            ),
+            "expando_dict": ModelExpansion(expansion_method_name="get_dict"),
+            "expando_awaitable": ModelExpansion(expansion_method_name="get_awaitable"),
+            "expando_scalar": ModelExpansion(expansion_method_name="get_scalar"),
+        }
+    )
+
+
+def test_expansion_response_model_from_return_annotation() -> None:
+    schema = FromAnnotationThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
+
+    assert schema["properties"]["expando_list"] == {
+        "title": "FromAnnotationExpanded",
+        "description": "Request by name or using fieldset(s): `expando_list`.",
+        "type": "array",
+        "items": {"$ref": "#/$defs/FromAnnotationExpanded"},
+    }
+    assert schema["properties"]["expando_optional_list"] == {
+        "title": "FromAnnotationExpanded",
+        "description": "Request by name or using fieldset(s): `expando_optional_list`.",
+        "anyOf": [
+            {"type": "array", "items": {"$ref": "#/$defs/FromAnnotationExpanded"}},
+            {"type": "null"},
+        ],
+    }
+    assert schema["properties"]["expando_dict"] == {
+        "title": "FromAnnotationExpanded",
+        "description": "Request by name or using fieldset(s): `expando_dict`.",
+        "type": "object",
+        "additionalProperties": {"$ref": "#/$defs/FromAnnotationExpanded"},
+    }
+    assert schema["properties"]["expando_awaitable"] == {
+        "title": "FromAnnotationExpanded",
+        "description": "Request by name or using fieldset(s): `expando_awaitable`.",
+        "$ref": "#/$defs/FromAnnotationExpanded",
+    }
+
+    # only model types are inferred, scalars still need an explicit response_model
+    assert "expando_scalar" not in schema["properties"]
+
+
+class ForwardRefThing(BaseModel):
+    field1: str
+
+    def get_later(self, context: Any) -> "ForwardRefExpanded":
+        return ForwardRefExpanded(efield1="efield1")
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "expando": ModelExpansion(expansion_method_name="get_later"),
+        }
+    )
+
+
+# generated before the annotation's target is defined
+_EARLY_FORWARD_REF_SCHEMA = ForwardRefThing.model_json_schema(
+    schema_generator=FieldsetGenerateJsonSchema
+)
+
+
+class ForwardRefExpanded(BaseModel):
+    efield1: str
+
+
+def test_expansion_response_model_from_late_forward_ref() -> None:
+    assert "expando" not in _EARLY_FORWARD_REF_SCHEMA["properties"]
+
+    schema = ForwardRefThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
+
+    assert schema["properties"]["expando"] == {
+        "title": "ForwardRefExpanded",
         "description": "Request by name or using fieldset(s): `expando`.",
-        "anyOf": [{"$ref": "#/$defs/Expanded"}, {"type": "null"}],
+        "$ref": "#/$defs/ForwardRefExpanded",
     }
 
 
-def test_unfieldseted_field_description() -> None:
-    class Thing(BaseModel):
-        field1: str
-        field2: str
+class UnfieldsetedThing(BaseModel):
+    field1: str
+    field2: str
+
+    fieldset_config: ClassVar = FieldsetConfig(
+        fieldsets={
+            "default": ["field1"],
+        }
+    )
 
-        fieldset_config: ClassVar = FieldsetConfig(
-            fieldsets={
-                "default": ["field1"],
-            }
-        )
 
-    schema = Thing.model_json_schema(schema_generator=FieldsetGenerateJsonSchema)
+def test_unfieldseted_field_description() -> None:
+    schema = UnfieldsetedThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema
+    )
 
     assert schema
     assert schema["properties"]
@@ -365,3 +487,53 @@ def test_unfieldseted_field_description() -> None:
         "description": "Not returned by default.  Request this field by name.",
         "type": "string",
     }
+
+
+def test_field_descriptions_stable_across_modes() -> None:
+    validation_schema = InFieldsetThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema, mode="validation"
+    )
+    serialization_schema = InFieldsetThing.model_json_schema(
+        schema_generator=FieldsetGenerateJsonSchema, mode="serialization"
+    )
+
+    assert validation_schema["properties"] == serialization_schema["properties"]
+    assert (
+        serialization_schema["properties"]["field2"]["description"]
+        == "Request by name or using fieldset(s): `extra`, `extra2`."
+    )
+
+
+class HasFieldsetsLeaf(BaseModel):
+    field1: str
+
+    fieldset_config: ClassVar = FieldsetConfig(fieldsets={"default": ["field1"]})
+
+
+class HasFieldsetsParent(BaseModel):
+    child: Optional[HasFieldsetsLeaf] = None
+
+
+class HasFieldsetsPlain(BaseModel):
+    field1: str
+
+
+class HasFieldsetsSelfReferencing(BaseModel):
+    parent: Optional["HasFieldsetsSelfReferencing"] = None
+
+
+@pytest.mark.parametrize(
+    "model,expected",
+    [
+        pytest.param(HasFieldsetsLeaf, True, id="configured"),
+        pytest.param(HasFieldsetsParent, True, id="configured_child"),
+        pytest.param(Optional[HasFieldsetsParent], True, id="optional"),
+        pytest.param(HasFieldsetsPlain, False, id="plain"),
+        pytest.param(HasFieldsetsSelfReferencing, False, id="self_referencing"),
+        pytest.param(int, False, id="not_a_model"),
+    ],
+)
+def test_model_has_fieldsets_defined(model: Any, expected: bool) -> None:
+    assert model_has_fieldsets_defined(model) is expected
+    # second lookup is served from the per class cache
+    assert model_has_fieldsets_defined(model) is expected